@@ -1,20 +1,153 @@
 # ビープ音を鳴らす関数
 # 参考：https://www.yoheim.net/blog.php?q=20180313
+#
+# beepOnは音を鳴らすスレッドに頼むだけで，鳴り終わるのを待たずに戻る．
+# 鳴らしている間に次々に頼まれた音は最後の1つだけ鳴らし，残りは飛ばす．
+# 音を鳴らす方法は環境変数BEEP_BACKEND，またはset_backend()で選べる（"null"なら鳴らさない）．
 
+import os
 import platform
+import subprocess
+import sys
+import threading
+
+BACKEND_ENV = "BEEP_BACKEND"
+
+# Windowsの場合は、winsoundというPython標準ライブラリを使います（読み込むのは1回だけ）.
+if platform.system() == "Windows":
+    import winsound
+else:
+    winsound = None
+
+
+def _beep_winsound(freq, dur):
+    winsound.Beep(freq, dur)
+
+
+def _beep_play(freq, dur):
+    # Macの場合には、Macに標準インストールされたplayコマンドを使います.
+    subprocess.run(["play", "-q", "-n", "synth", str(dur/1000), "sin", str(freq)],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _beep_null(freq, dur):
+    pass
+
+
+BACKENDS = {"winsound": _beep_winsound,
+            "play": _beep_play,
+            "null": _beep_null}
+
+
+def default_backend():
+    """環境変数BEEP_BACKEND，無ければOSに合わせた音の鳴らし方
+    BEEP_BACKENDが知らない名前なら警告を出して鳴らさない（"null"）
+    """
+    name = os.environ.get(BACKEND_ENV)
+    if name:
+        if name not in BACKENDS:
+            print("unknown %s: %s (%s), beep is disabled" % (BACKEND_ENV, name, ", ".join(BACKENDS)),
+                  file=sys.stderr)
+            return "null"
+        return name
+    return "winsound" if platform.system() == "Windows" else "play"
+
+
+def beepSync(freq, dur=100, backend=None):
+    """
+        ビープ音を鳴らし，鳴り終わるまで待つ.
+        @param freq 周波数
+        @param dur  継続時間（ms）
+    """
+    BACKENDS[backend or default_backend()](freq, dur)
+
+
+class BeepNotifier(object):
+    """1つのスレッドでビープ音を順に鳴らす
+    鳴らし終わる前に頼まれた音は最後の1つだけ残す
+    """
+    def __init__(self, backend=None):
+        """
+        @param backend BACKENDSのキー（Noneならdefault_backend()）
+        """
+        backend = backend or default_backend()
+        if backend not in BACKENDS:
+            raise ValueError("unknown beep backend: %s (%s)" % (backend, ", ".join(BACKENDS)))
+        self.backend = backend
+        self.played = 0
+        self.skipped = 0
+        self._pending = None
+        self._running = True
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def beep(self, freq, dur=100):
+        """
+            ビープ音を鳴らすよう頼む（待たずに戻る）.
+            @param freq 周波数
+            @param dur  継続時間（ms）
+        """
+        if self.backend == "null":
+            return
+        with self._cond:
+            if self._pending is not None:
+                self.skipped += 1
+            self._pending = (freq, dur)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="BeepNotifier", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or not self._running)
+                if self._pending is None:
+                    break
+                freq, dur = self._pending
+                self._pending = None
+            try:
+                BACKENDS[self.backend](freq, dur)
+                self.played += 1
+            except (OSError, RuntimeError):
+                # 音を鳴らせない環境（playが無いなど）では以後は鳴らさない
+                self.backend = "null"
+
+    def close(self):
+        """頼まれている音を鳴らし終えてからスレッドを終了する
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_notifier = None
+_lock = threading.Lock()
+
+
+def set_backend(name=None):
+    """
+        beepOnの音の鳴らし方を変える.
+        @param name BACKENDSのキー（"null"なら鳴らさない．Noneならdefault_backend()）
+    """
+    global _notifier
+    with _lock:
+        if _notifier is not None:
+            _notifier.close()
+        _notifier = BeepNotifier(name)
+
 
 def beepOn(freq, dur=100):
     """
-        ビープ音を鳴らす.
+        ビープ音を鳴らす（鳴り終わるのを待たない）.
         @param freq 周波数
         @param dur  継続時間（ms）
     """
-    if platform.system() == "Windows":
-        # Windowsの場合は、winsoundというPython標準ライブラリを使います.
-        import winsound
-        winsound.Beep(freq, dur)
-    else:
-        # Macの場合には、Macに標準インストールされたplayコマンドを使います.
-        import os
-        os.system('play -n synth %s sin %s' % (dur/1000, freq))
-        
\ No newline at end of file
+    global _notifier
+    with _lock:
+        if _notifier is None:
+            _notifier = BeepNotifier()
+    _notifier.beep(freq, dur)
@@ -0,0 +1,83 @@
+"""
+    複数枚平均の処理時間とメモリ使用量を測る
+
+    カメラを使わずに，define.pyの解像度の乱数画像で
+    従来のfloat64による平均とAveragerによる整数加算を比べる．
+
+    使い方:
+        python benchAverage.py [枚数 ...]
+"""
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from define import *
+from easyCap import Averager, average_shot
+
+
+class BenchCamera(object):
+    """SnapImage/GetImageで用意した画像を順番に返すだけのカメラ
+    """
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+
+    def GetImageDescription(self):
+        height, width, channels = self.frames[0].shape
+        return (width, height, channels*8, 1)
+
+    def SnapImage(self):
+        self.index = (self.index + 1) % len(self.frames)
+        return 1
+
+    def GetImage(self):
+        return self.frames[self.index]
+
+    def GetImageEx(self):
+        return self.frames[self.index]
+
+
+def average_shot_float(Camera, ave):
+    """変更前のaverage_shot（比較用）
+    """
+    width, height, bits, cformat = Camera.GetImageDescription()
+    img_ave = np.zeros((height, width, 3))
+    for i in range(ave):
+        Camera.SnapImage()
+        img_ave += Camera.GetImage()/ave
+    img_flip = cv2.flip(img_ave, 0)
+    return np.clip(img_flip, 0, 255).astype(np.uint8)
+
+
+def measure(func, repeat=3):
+    """funcの1回あたりの時間[sec]とメモリ使用量のピーク[byte]を返す
+    """
+    func()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start)/repeat
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    counts = [int(v) for v in sys.argv[1:]] or [1, 4, 16]
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (IMAGE_HEIGHT, IMAGE_WIDTH, IMAGE_BPP//8), dtype=np.uint8)
+              for i in range(4)]
+    Camera = BenchCamera(frames)
+    averager = Averager()
+
+    print(f"{IMAGE_WIDTH}x{IMAGE_HEIGHT}x{IMAGE_BPP}bit")
+    print(f"{'ave':>4} {'method':>8} {'ms/frame':>10} {'peak MB':>9}")
+    for ave in counts:
+        for name, func in (("float64", lambda: average_shot_float(Camera, ave)),
+                           ("integer", lambda: average_shot(Camera, ave, averager))):
+            elapsed, peak = measure(func)
+            print(f"{ave:>4} {name:>8} {elapsed*1000:>10.1f} {peak/2**20:>9.1f}")
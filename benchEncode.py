@@ -0,0 +1,91 @@
+"""
+    保存形式ごとのエンコード時間とファイルサイズを測る
+
+    模擬カメラ（simCam.py）でdefine.pyの解像度の画像を撮り，
+    encoders.pyの各保存形式で，メモリ上でのエンコード（encode）と一時フォルダへの書き込み（write）の
+    1枚あたりの時間とバイト数を表示する．writeの時間はエンコードを含み，その差がファイルの書き込みの時間になる．
+
+    使い方:
+        python benchEncode.py [回数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import tisgrabber as tis
+from define import *
+from encoders import make_encoder
+from simCam import SimCamera
+
+# (表示名, 画素形式, エンコーダ名, 引数)
+CASES = [("jpeg q=" + str(compressionRate), "RGB24", "jpeg", {}),
+         ("jpeg q=95", "RGB24", "jpeg", {"quality": 95}),
+         ("jpeg optimize", "RGB24", "jpeg", {"optimize": True}),
+         ("png level=1", "RGB24", "png", {"level": 1}),
+         ("png level=6", "RGB24", "png", {"level": 6}),
+         ("tiff", "RGB24", "tiff", {}),
+         ("npy", "RGB24", "npy", {}),
+         ("native jpeg", "RGB24", "native", {}),
+         ("png Y16", "Y16", "png", {"level": 1}),
+         ("tiff Y16", "Y16", "tiff", {}),
+         ("npy Y16", "Y16", "npy", {})]
+
+
+def snap(Camera, sink):
+    """sinkの画素形式で1枚撮影して上下反転した画像を返す
+    """
+    Camera.SetFormat(tis.SinkFormats[sink])
+    Camera.StartLive(0)
+    Camera.SnapImage()
+    frame = np.ascontiguousarray(Camera.GetImageEx()[::-1])
+    Camera.StopLive()
+    return frame
+
+
+def measure_encode(encoder, frame, repeat):
+    """1枚あたりのエンコード時間[sec]を返す（メモリ上でエンコードできない保存形式はNone）
+    """
+    if not encoder.can_encode:
+        return None
+    encoder.encode(frame)
+    start = time.perf_counter()
+    for i in range(repeat):
+        encoder.encode(frame)
+    return (time.perf_counter() - start)/repeat
+
+
+def measure(encoder, frame, folder, repeat):
+    """1枚あたりの書き込み時間[sec]とファイルサイズ[byte]を返す
+    """
+    fileName = os.path.join(folder, "bench" + encoder.extension)
+    encoder.write(fileName, frame)
+    start = time.perf_counter()
+    for i in range(repeat):
+        encoder.write(fileName, frame)
+    elapsed = (time.perf_counter() - start)/repeat
+    return elapsed, os.path.getsize(fileName)
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    Camera = SimCamera()
+    Camera.openVideoCaptureDevice("DFK 38UX304")
+    frames = {}
+
+    print(f"{IMAGE_WIDTH}x{IMAGE_HEIGHT}")
+    print(f"{'encoder':>14} {'encode ms':>10} {'write ms':>10} {'MB/frame':>9} {'frame/s':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, sink, encoder_name, options in CASES:
+            if sink not in frames:
+                frames[sink] = snap(Camera, sink)
+            if encoder_name == "native":
+                encoder = make_encoder(encoder_name, Camera, **options)
+            else:
+                encoder = make_encoder(encoder_name, **options)
+            encoded = measure_encode(encoder, frames[sink], repeat)
+            elapsed, size = measure(encoder, frames[sink], folder, repeat)
+            encoded = "-" if encoded is None else f"{encoded*1000:.1f}"
+            print(f"{name:>14} {encoded:>10} {elapsed*1000:>10.1f} {size/2**20:>9.2f} {1/elapsed:>8.1f}")
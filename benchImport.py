@@ -0,0 +1,64 @@
+"""
+    モジュールのインポート時間を測る
+
+    モジュールごとに新しいPythonプロセスでimportに掛かった時間を測り，中央値を表示する．
+    takePic.pyの起動時間（STARTUP_BUDGET_SEC）の内訳を確認するのに使う．
+
+    使い方:
+        python benchImport.py [回数]
+"""
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+TAKEPIC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "takePic.py")
+
+
+def imported_modules(path):
+    """pathのファイルがトップレベルでimportしているモジュール名のリスト（実行はしない）
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules = [node.module]
+        else:
+            continue
+        names += [m for m in modules if m not in names]
+    return names
+
+
+# 測るモジュール（takePicはtakePic.pyが起動時に読み込むものをまとめたもの．takePic.pyから読み取る）
+MODULES = {"numpy": "import numpy",
+           "cv2": "import cv2",
+           "tisgrabber": "import tisgrabber",
+           "easyCap": "import easyCap",
+           "takePic": "import " + ", ".join(imported_modules(TAKEPIC_FILE))}
+
+CODE = """
+import time
+t = time.perf_counter()
+{}
+print(time.perf_counter() - t)
+"""
+
+
+def import_time(statement):
+    """新しいプロセスでstatementを実行し，掛かった時間[sec]を返す
+    """
+    out = subprocess.run([sys.executable, "-c", CODE.format(statement)],
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.split()[-1])
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'module':>12} {'median ms':>10} {'min ms':>8}")
+    for name, statement in MODULES.items():
+        times = [import_time(statement) for i in range(repeat)]
+        print(f"{name:>12} {statistics.median(times)*1000:>10.1f} {min(times)*1000:>8.1f}")
@@ -0,0 +1,250 @@
+"""
+    撮影・合成・HDR・保存の処理時間をまとめて測り，基準の結果と比べる
+
+    模擬カメラ（simCam.py）などのバックエンドでdefine.pyの解像度の画像を使い，
+    次の処理の1回あたりの時間（中央値と最小値）を測ってJSONファイルに書き出す．
+        capture:  CaptureSession.captureの1枚撮影，複数枚平均（N=1〜16），HDR
+        getimage: TIS_CAMのGetImage，GetImageEx（ctypesの画像バッファからnumpy配列を作る），GetImageInto（コピー）
+        ops:      cv2.flip，np.clip，astypeなど変更前の平均処理で使っていた変換
+        encode:   benchEncode.pyの各保存形式（ファイルへの書き込みと，メモリ上のエンコードだけ）
+    基準ファイルがあれば中央値を比べ，許容範囲より遅くなった項目があれば終了コード1で終わる．
+    基準と解像度かrealtimeが違うときは比べずに終了コード3で終わる．
+    模擬カメラと再生（replay）はフレームの間隔を待たずに次のフレームを返すので，captureは処理だけの時間になる
+    （--realtimeを付けるとfpsと露光時間どおりに待つ．実機（dll）は常にフレームの到着を待つ）．
+    getimageは模擬カメラでもTIS_CAMの変換処理を，バックエンドの画像バッファを指すポインタで動かして測る．
+
+    使い方:
+        python benchSuite.py                                  # 測ってbench_result.jsonに書く
+        python benchSuite.py --save-baseline                  # 結果をbench_baseline.jsonにする
+        python benchSuite.py --groups capture ops --repeat 5  # 一部だけ測る
+        python benchSuite.py --backend sim --width 1024 --height 750
+        python benchSuite.py --backend replay --source burst.tisarc   # 保存した画像で測る
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import tisgrabber as tis
+from define import *
+from easyCap import CaptureSession
+from encoders import make_encoder
+from framePool import FramePool
+from benchEncode import CASES as ENCODE_CASES, snap
+
+RESULT_FILE = "bench_result.json"
+BASELINE_FILE = "bench_baseline.json"
+DEVICE_NAME = "DFK 38UX304" # 開くカメラ（takePic.pyと同じ）
+TOLERANCE = 0.10 # 基準より何割遅くなったら遅くなったとみなすか
+MIN_MS = 0.05 # 基準がこれより短い項目[ms]は測定の誤差が大きいので遅くなったとみなさない
+COMPARED_ENVIRONMENT = ("resolution", "realtime") # 基準と同じでないと比べられない項目
+AVERAGE_COUNTS = (1, 2, 4, 8, 16)
+GROUPS = ("capture", "getimage", "ops", "encode")
+
+
+def measure(func, repeat):
+    """funcを1回試してからrepeat回呼び，1回あたりの時間[sec]の中央値と最小値を返す
+    """
+    func()
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), min(times)
+
+
+def capture_cases(Camera):
+    """(名前, 関数) のリスト．撮影結果のバッファはプールに返して使い回す
+    """
+    session = CaptureSession(Camera)
+    session.pool = FramePool(2)
+
+    def shot(average):
+        def func():
+            session.pool.release(session.capture(average=average))
+        return func
+
+    cases = [("capture single", shot(1))]
+    cases += [("capture average N=%d" % n, shot(n)) for n in AVERAGE_COUNTS]
+    cases.append(("capture hdr", lambda: session.capture(HDR=True)))
+    return cases, session.stop
+
+
+def dll_view(Camera):
+    """TIS_CAMのGetImage/GetImageEx/GetImageIntoを，Cameraの画像バッファを指すポインタで動かすインスタンス
+    （DLLが無くても，ctypesの配列からnumpy配列を作る処理を測れる．実機ならCameraをそのまま返す）
+    """
+    if isinstance(Camera, tis.TIS_CAM):
+        return Camera
+    view = object.__new__(tis.TIS_CAM)
+    view._description = Camera.GetImageDescription()
+    view._buffer_type = None
+    view.GetImagePtr = Camera.GetImagePtr
+    return view
+
+
+def getimage_cases(Camera):
+    Camera.StartLive(0)
+    Camera.SnapImage()
+    view = dll_view(Camera)
+    width, height, bits, cformat = view.GetImageDescription()
+    out = np.empty((height, width, bits//8), dtype=np.uint8)
+    cases = [("getimage GetImage", view.GetImage),
+             ("getimage GetImageEx", view.GetImageEx),
+             ("getimage GetImageInto", lambda: view.GetImageInto(out))]
+    return cases, Camera.StopLive
+
+
+def ops_cases(frame):
+    """変更前の平均処理（float64に足してflip，clip，astype）の各段階
+    """
+    acc = frame.astype(np.float64)
+    flipped = cv2.flip(acc, 0)
+    clipped = np.clip(flipped, 0, 255)
+    out = np.empty_like(frame)
+    cases = [("ops flip uint8", lambda: cv2.flip(frame, 0)),
+             ("ops flip uint8 into", lambda: cv2.flip(frame, 0, dst=out)),
+             ("ops astype float64", lambda: frame.astype(np.float64)),
+             ("ops flip float64", lambda: cv2.flip(acc, 0)),
+             ("ops clip float64", lambda: np.clip(flipped, 0, 255)),
+             ("ops astype uint8", lambda: clipped.astype(np.uint8))]
+    return cases, None
+
+
+def encode_cases(Camera, folder):
+    frames = {}
+    cases = []
+    for name, sink, encoder_name, options in ENCODE_CASES:
+        if sink not in frames:
+            frames[sink] = snap(Camera, sink)
+        if encoder_name == "native":
+            encoder = make_encoder(encoder_name, Camera, **options)
+        else:
+            encoder = make_encoder(encoder_name, **options)
+        fileName = os.path.join(folder, "bench" + encoder.extension)
+        # writeはエンコードとファイルの書き込み，encodeはメモリ上のエンコードだけ
+        cases.append(("encode " + name, lambda e=encoder, f=fileName, img=frames[sink]: e.write(f, img)))
+        if encoder.can_encode:
+            cases.append(("encode " + name + " in memory", lambda e=encoder, img=frames[sink]: e.encode(img)))
+    Camera.SetFormat(tis.SinkFormats.RGB24)
+    return cases, None
+
+
+def run(Camera, groups, repeat, folder):
+    """groupsの処理を測り，{名前: {"median_ms", "min_ms", "repeat"}} を返す
+    """
+    results = {}
+    for group in groups:
+        if group == "capture":
+            cases, cleanup = capture_cases(Camera)
+        elif group == "getimage":
+            cases, cleanup = getimage_cases(Camera)
+        elif group == "ops":
+            cases, cleanup = ops_cases(snap(Camera, "RGB24"))
+        elif group == "encode":
+            cases, cleanup = encode_cases(Camera, folder)
+        else:
+            raise ValueError("unknown group: %s (%s)" % (group, ", ".join(GROUPS)))
+        for name, func in cases:
+            median, fastest = measure(func, repeat)
+            results[name] = {"median_ms": median*1000, "min_ms": fastest*1000, "repeat": repeat}
+            print(f"{name:>28} {median*1000:>10.2f} {fastest*1000:>10.2f}", flush=True)
+        if cleanup is not None:
+            cleanup()
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """基準と比べて表示し，遅くなった項目の名前のリストを返す
+    """
+    slower = []
+    print(f"{'case':>28} {'median ms':>10} {'baseline':>10} {'change':>8}")
+    for name, r in results.items():
+        if name not in baseline:
+            print(f"{name:>28} {r['median_ms']:>10.2f} {'-':>10} {'new':>8}")
+            continue
+        base = baseline[name]["median_ms"]
+        change = r["median_ms"]/base - 1 if base > 0 else 0.0
+        mark = ""
+        if change > tolerance and base >= MIN_MS:
+            slower.append(name)
+            mark = " slower"
+        print(f"{name:>28} {r['median_ms']:>10.2f} {base:>10.2f} {change*100:>+7.1f}%{mark}")
+    return slower
+
+
+def environment(Camera, backend):
+    width, height, bits, cformat = Camera.GetImageDescription()
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": backend,
+            "realtime": getattr(Camera, "realtime", True),
+            "resolution": [width, height],
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="capture/stack/HDR/encode benchmark")
+    parser.add_argument("--backend", default="sim", help="TIS_CAMのバックエンド（dllなら実機）")
+    parser.add_argument("--device", default=DEVICE_NAME, help="開くカメラの名前")
+    parser.add_argument("--width", type=int, default=IMAGE_WIDTH)
+    parser.add_argument("--height", type=int, default=IMAGE_HEIGHT)
+    parser.add_argument("--source", help="replayで再生するフォルダまたは.tisarcのファイル")
+    parser.add_argument("--realtime", action="store_true", help="sim/replayでフレームの間隔を待つ")
+    parser.add_argument("--groups", nargs="+", default=list(GROUPS), choices=GROUPS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=RESULT_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help="結果を基準ファイルにも書く")
+    args = parser.parse_args()
+
+    if args.backend == "dll":
+        keyargs = {}
+    elif args.backend == "replay":
+        keyargs = {"source": args.source, "realtime": args.realtime}
+    else:
+        keyargs = {"width": args.width, "height": args.height, "realtime": args.realtime}
+    Camera = tis.TIS_CAM(args.backend, **keyargs)
+    if Camera.openVideoCaptureDevice(args.device) != tis.IC_SUCCESS:
+        print("could not open " + args.device, file=sys.stderr)
+        sys.exit(2)
+    Camera.SetFormat(tis.SinkFormats.RGB24)
+
+    print(f"{'case':>28} {'median ms':>10} {'min ms':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        results = run(Camera, args.groups, args.repeat, folder)
+    report = {"environment": environment(Camera, args.backend), "results": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("baseline saved: " + args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        differs = [key for key in COMPARED_ENVIRONMENT
+                   if baseline["environment"].get(key, True) != report["environment"][key]]
+        if differs:
+            for key in differs:
+                print("baseline %s differs: %s (this run: %s)"
+                      % (key, baseline["environment"].get(key, True), report["environment"][key]), file=sys.stderr)
+            print("not compared with " + args.baseline, file=sys.stderr)
+            sys.exit(3)
+        slower = compare(results, baseline["results"], args.tolerance)
+        if slower:
+            print(f"{len(slower)} case(s) slower than baseline by more than {args.tolerance*100:.0f}%",
+                  file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,130 @@
+"""
+    カメラのプロパティの読み書きをまとめる
+
+    最後に書いた（読んだ）値と値の範囲を覚えておき，同じ値の書き込みはカメラに送らない．
+    USB3のカメラはプロパティの書き込みごとに待ち時間があるので，毎回の撮影で
+    同じExposureやAutoの切り替えを送り直さないようにする．
+
+    プロパティの種類（kind）:
+        "absolute": SetPropertyAbsoluteValue（秒やdBの実数値．Exposureなど）
+        "value":    SetPropertyValue（整数値．Gainなど）
+        "switch":   SetPropertySwitch（Auto，Enableなどのオン・オフ）
+
+    使い方:
+        properties = PropertyCache(Camera)
+        properties.apply({("Exposure", "Auto"): 0, ("Exposure", "Value"): 0.01})
+        exposure = properties.get("Exposure", "Value")
+"""
+import sys
+
+# (Property, Element) → kind．無いものはElementがAuto/Enableならswitch，それ以外はvalue
+PROPERTY_KINDS = {("Exposure", "Value"): "absolute",
+                  ("Gain", "Value"): "value",
+                  ("Brightness", "Value"): "value",
+                  ("Gamma", "Value"): "value",
+                  ("WhiteBalance", "White Balance Red"): "value",
+                  ("WhiteBalance", "White Balance Green"): "value",
+                  ("WhiteBalance", "White Balance Blue"): "value"}
+
+SWITCH_ELEMENTS = ("Auto", "Enable", "One Push")
+
+
+def property_kind(Property, Element):
+    """プロパティの種類を返す
+    """
+    if (Property, Element) in PROPERTY_KINDS:
+        return PROPERTY_KINDS[(Property, Element)]
+    return "switch" if Element in SWITCH_ELEMENTS else "value"
+
+
+class PropertyCache(object):
+    """値の変わったプロパティだけをカメラに書き込む
+    """
+    def __init__(self, Camera):
+        """
+        Params:
+            Camera: IC.TIS_CAM()で作成したインスタンス
+        """
+        self.Camera = Camera
+        self.values = {}
+        self.ranges = {}
+        self.writes = 0
+        self.skipped = 0
+
+    def invalidate(self):
+        """覚えている値を捨てる（ライブ映像の停止やデバイス設定の読み込みの後など，カメラ側で値が変わりうるとき）
+        """
+        self.values.clear()
+
+    def _read(self, Property, Element, kind):
+        if kind == "absolute":
+            value = [0]
+            self.Camera.GetPropertyAbsoluteValue(Property, Element, value)
+            return value[0]
+        if kind == "switch":
+            value = [0]
+            self.Camera.GetPropertySwitch(Property, Element, value)
+            return value[0]
+        return self.Camera.GetPropertyValue(Property, Element)
+
+    def _write(self, Property, Element, Value, kind):
+        if kind == "absolute":
+            return self.Camera.SetPropertyAbsoluteValue(Property, Element, Value)
+        if kind == "switch":
+            return self.Camera.SetPropertySwitch(Property, Element, int(Value))
+        return self.Camera.SetPropertyValue(Property, Element, int(Value))
+
+    def get(self, Property, Element="Value", refresh=False):
+        """プロパティの値を返す（覚えていればカメラに問い合わせない）
+        """
+        key = (Property, Element)
+        if refresh or key not in self.values:
+            self.values[key] = self._read(Property, Element, property_kind(Property, Element))
+        return self.values[key]
+
+    def range(self, Property, Element="Value"):
+        """プロパティの範囲 (最小, 最大) を返す（1回だけ問い合わせる．範囲の無いプロパティはNone）
+        """
+        key = (Property, Element)
+        if key not in self.ranges:
+            if property_kind(Property, Element) == "absolute":
+                self.ranges[key] = self.Camera.GetPropertyAbsoluteValueRange(Property, Element)
+            else:
+                self.ranges[key] = self.Camera.GetPropertyValueRange(Property, Element)
+        return self.ranges[key]
+
+    def set(self, Property, Element, Value):
+        """値が変わっていればカメラに書き込む
+        範囲外の値はValueError．カメラが書き込みに失敗したときは表示だけして続ける
+        Returns:
+            書き込んだらTrue，同じ値なので送らなかった（または失敗した）らFalse
+        """
+        key = (Property, Element)
+        if self.values.get(key) == Value:
+            self.skipped += 1
+            return False
+        kind = property_kind(Property, Element)
+        limits = None if kind == "switch" else self.range(Property, Element)
+        if limits is not None:
+            low, high = limits
+            if not low <= Value <= high:
+                raise ValueError("%s %s must be in [%s, %s]: %s" % (Property, Element, low, high, Value))
+        error = self._write(Property, Element, Value, kind)
+        if error != 1:
+            self.values.pop(key, None)
+            print("could not set %s %s to %s (error %s)" % (Property, Element, Value, error), file=sys.stderr)
+            return False
+        self.values[key] = Value
+        self.writes += 1
+        return True
+
+    def apply(self, settings):
+        """複数のプロパティをまとめて書き込む
+        AutoなどのスイッチはValueより先に書く（自動調整を切ってから値を書く）
+        Params:
+            settings: {(Property, Element): Value}
+        Returns:
+            カメラに書き込んだ数
+        """
+        keys = sorted(settings, key=lambda key: property_kind(*key) != "switch")
+        return sum(self.set(Property, Element, settings[(Property, Element)]) for Property, Element in keys)
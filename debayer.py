@@ -0,0 +1,76 @@
+"""
+    ベイヤー配列の画像をカラー画像にする
+
+    Y800/Y16で撮影した画像はベイヤー配列のまま保存しておき，デモザイクは後でまとめて行う．
+    撮影中はデモザイクを行わないので，1枚あたりのデータ量と処理時間が減る．
+
+    使い方:
+        bgr = debayer(raw)                      # rawは上下反転後の画像
+        python debayer.py 入力フォルダ [出力フォルダ] [配列]
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from define import *
+
+# 画像の左上2x2の並び → OpenCVの変換コード
+# OpenCVのBayer名は2行目の2,3画素目で数えるので，左上から読んだ並びとはずれる
+BAYER_CODES = {"RGGB": cv2.COLOR_BayerBG2BGR,
+               "BGGR": cv2.COLOR_BayerRG2BGR,
+               "GRBG": cv2.COLOR_BayerGB2BGR,
+               "GBRG": cv2.COLOR_BayerGR2BGR}
+
+RAW_EXTENSIONS = (".png", ".tif", ".tiff", ".npy")
+
+
+def debayer(raw, pattern=BAYER_PATTERN):
+    """ベイヤー配列の画像(uint8またはuint16)をBGR画像にする（型はそのまま）
+    Params:
+        raw: (height, width) または (height, width, 1) の画像
+        pattern: 画像の左上2x2の並び "RGGB", "BGGR", "GRBG", "GBRG"
+    """
+    if pattern not in BAYER_CODES:
+        raise ValueError("unknown bayer pattern: " + str(pattern))
+    if raw.ndim == 3:
+        raw = raw[:, :, 0]
+    return cv2.cvtColor(np.ascontiguousarray(raw), BAYER_CODES[pattern])
+
+
+def load_raw(path):
+    """保存したベイヤー配列の画像を読む（16bitはそのまま）
+    """
+    if path.endswith(".npy"):
+        return np.load(path)
+    return cv2.imread(path, cv2.IMREAD_UNCHANGED)
+
+
+def debayer_folder(src, dst=None, pattern=BAYER_PATTERN):
+    """フォルダ内のベイヤー配列の画像をまとめてカラー画像にする
+    元の拡張子（.npyは.png）のまま，16bitの画像は16bitで書き出す
+    """
+    dst = src + "_color" if dst is None else dst
+    os.makedirs(dst, exist_ok=True)
+    count = 0
+    for name in sorted(os.listdir(src)):
+        base, ext = os.path.splitext(name)
+        if ext.lower() not in RAW_EXTENSIONS:
+            continue
+        raw = load_raw(os.path.join(src, name))
+        if raw is None or raw.ndim == 3 and raw.shape[2] != 1:
+            continue
+        ext = ".png" if ext.lower() == ".npy" else ext
+        cv2.imwrite(os.path.join(dst, base + ext), debayer(raw, pattern))
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    dst = sys.argv[2] if len(sys.argv) > 2 else None
+    pattern = sys.argv[3] if len(sys.argv) > 3 else BAYER_PATTERN
+    print(str(debayer_folder(sys.argv[1], dst, pattern)) + " images converted")
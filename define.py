@@ -7,4 +7,7 @@ compressionRate = 90
 # 画像のインポート
 IMAGE_WIDTH = 4096
 IMAGE_HEIGHT = 3000
-IMAGE_BPP = 24
\ No newline at end of file
+IMAGE_BPP = 24
+
+# Y800/Y16で撮影したときのベイヤー配列（上下反転後の画像の左上2x2）
+BAYER_PATTERN = "RGGB"
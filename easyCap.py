@@ -2,72 +2,364 @@
     The Imaging Sourceのカメラで簡単に撮影する
     
     機能:
-        Exposureの設定，Gainの設定，複数枚撮影によるノイズ低減，簡易HDR
+        Exposureの設定，Gainの設定，複数枚撮影によるノイズ低減（平均，中央値，シグマクリップ，最小・最大），簡易HDR
+        CaptureSessionによるライブ映像を止めない連続撮影
+        Y800/Y16（ベイヤー配列のまま）での撮影．Y16は16bitのまま合成する
+        TriggerSessionによるトリガーモードでの連写（ソフトウェアトリガー，ハードウェアトリガー）
+        段階ごとの処理時間の計測（CaptureSession.metricsにmetrics.Metricsを設定する）
 """
-import cv2
+import time
+
 import numpy as np
 
-def capture(Camera, Exposure=0, Gain=0, average=1, HDR=False):
+from define import *
+from tisgrabber import SinkFormats, IC_SUCCESS
+from liveStream import Frame, FrameStream
+from cameraProperties import PropertyCache
+from stacking import *
+from hdrPipeline import merge_hdr
+from debayer import debayer
+from metrics import NULL_METRICS
+
+# HDR撮影の露光倍率テーブル（基準の露光時間に掛ける）
+BRACKET_TABLES = {3: (0.5, 1.0, 2.0),
+                  5: (0.25, 0.5, 1.0, 2.0, 4.0)}
+
+def image_format(Camera):
+    """撮影される画像の形と型を返す
+    Y16はuint16の1チャンネル，それ以外はuint8
     """
-    Params:
-        Camera: IC.TIS_CAM()で作成したインスタンス
-        Exposure: 露光時間
-        Gain: ゲイン
-        average: 複数枚撮影の枚数（引数で入力されない場合ワンショットになる）
-        HDR: Trueにすると，露光時間を変えて複数枚撮影しDebevecの手法でHDR合成する(デフォルトではFalse)
+    width, height, bits, cformat = Camera.GetImageDescription()
+    if cformat == SinkFormats.Y16.value:
+        return (height, width, 1), np.uint16
+    return (height, width, bits//8), np.uint8
+
+def snap_image(Camera):
+    """1枚撮影する
+    SnapImageが失敗したら（フレームが届かない，再生が終わったなど）古い画像を使わないようRuntimeError
     """
+    error = Camera.SnapImage()
+    if error != IC_SUCCESS:
+        raise RuntimeError("SnapImage failed (error %s)" % error)
+
+def average_shot(Camera, ave, stacker=None, out=None, metrics=NULL_METRICS):
+    """複数枚撮影を行う
+    stackerを渡すと合成方式を変えられる（省略時は平均）．バッファも使い回す
+    outを渡すと結果をそこに書き込む
+    metricsを渡すとsnap，get_image，stack，result（合成結果の計算と上下反転）の時間を記録する
+    """
+    if stacker is None:
+        stacker = Averager()
+    shape, dtype = image_format(Camera)
+    stacker.reset(shape, ave, dtype)
+    for i in range(ave):
+        with metrics.stage("snap"):
+            snap_image(Camera)
+        with metrics.stage("get_image"):
+            img = Camera.GetImageEx()
+        with metrics.stage("stack"):
+            stacker.add(img)
+    with metrics.stage("result"):
+        return stacker.result(out)
+
+def set_properties(Camera, Exposure, Gain):
+    """ExposureとGainを設定する
+    値が0以下なら前回の設定が引き継がれる
+    """
+    if Exposure>0:
+        Camera.SetPropertySwitch("Exposure", "Auto", 0)
+        Camera.SetPropertyAbsoluteValue("Exposure","Value", Exposure)
         
-    def average_shot(Obj, ave):
-        """複数枚撮影を行う
-        """
-        width, height, bits, cformat = Camera.GetImageDescription()
-        img_ave = np.zeros((height, width, 3))
-        for i in range(ave):
-            Obj.SnapImage()
-            img_ave += Obj.GetImage()/ave
-        img_flip = cv2.flip(img_ave, 0)
-        return np.clip(img_flip, 0, 255).astype(np.uint8)
-    
-    def set_properties(Obj, Exposure, Gain):
+    if Gain>0:
+        Camera.SetPropertySwitch("Gain", "Auto", 0)
+        Camera.SetPropertyValue("Gain","Value", Gain)
+
+
+class CaptureSession(object):
+    """ライブ映像を開始したまま連続撮影を行う
+
+    StartLive/StopLiveは開始時と終了時に1回だけ呼ばれるので，
+    撮影ごとにストリームの立ち上げを待つ必要がない．
+    ExposureとGain（とそのAuto）は値が変わったときだけカメラに送り（cameraProperties.PropertyCache），
+    変えた直後のsettle枚のフレームは古い設定で露光されている可能性があるので捨てる．
+
+    使い方:
+        with CaptureSession(Camera) as session:
+            frame = session.capture(Exposure=0.01, Gain=10)
+    """
+    def __init__(self, Camera, settle=1):
+        """
+        Params:
+            Camera: IC.TIS_CAM()で作成したインスタンス
+            settle: ExposureやGainを変えた後に捨てるフレーム数
+        """
+        self.Camera = Camera
+        self.settle = settle
+        self.live = False
+        self._unsettled = False
+        self.stackers = {}
+        # 通常撮影の結果を書き込むバッファプール（framePool.FramePool．Noneなら毎回確保する）
+        self.pool = None
+        # HDR合成に使う応答曲線（hdrPipeline.load_responseで読んだもの．Noneなら推定しない）
+        self.response = None
+        self.properties = PropertyCache(Camera)
+        # 段階ごとの処理時間の記録先（metrics.Metrics．NULL_METRICSなら計らない）
+        self.metrics = NULL_METRICS
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def start(self):
+        """ライブ映像を開始する（開始済みなら何もしない）
+        """
+        if not self.live:
+            self.Camera.StartLive(0)
+            self.live = True
+
+    def stop(self):
+        """ライブ映像を停止する
+        停止後はカメラ側の設定が変わる可能性があるので記録した値も破棄する
+        """
+        if self.live:
+            self.Camera.StopLive()
+            self.live = False
+        self.properties.invalidate()
+        self._unsettled = False
+
+    def set_properties(self, Exposure, Gain):
         """ExposureとGainを設定する
-        値が0以下なら前回の設定が引き継がれる
+        値が0以下，または前回と同じ値ならカメラには送らない
         """
+        settings = {}
         if Exposure>0:
-            Obj.SetPropertySwitch("Exposure", "Auto", 0)
-            Obj.SetPropertyAbsoluteValue("Exposure","Value", Exposure)
-            
+            settings[("Exposure", "Auto")] = 0
+            settings[("Exposure", "Value")] = Exposure
         if Gain>0:
-            Obj.SetPropertySwitch("Gain", "Auto", 0)
-            Obj.SetPropertyValue("Gain","Value", Gain)
-    
-    Camera.StartLive(0)
-    set_properties(Camera, Exposure, Gain)
-    if HDR==False:
-        """通常撮影モード
+            settings[("Gain", "Auto")] = 0
+            settings[("Gain", "Value")] = Gain
+        self.apply_properties(settings)
+
+    def apply_properties(self, settings):
+        """プロパティをまとめて設定し，カメラに書き込んだ数を返す
+        書き込んだら次の撮影で古い設定のフレームを捨てる
+        Params:
+            settings: {(Property, Element): Value}
+        """
+        changes = self.properties.apply(settings)
+        if changes:
+            self._unsettled = True
+        return changes
+
+    def settle_frames(self):
+        """設定を変えた後なら，古い設定で露光されたフレームを捨てる
+        """
+        if self._unsettled:
+            with self.metrics.stage("settle"):
+                for i in range(self.settle):
+                    snap_image(self.Camera)
+            self._unsettled = False
+
+    def reference(self):
+        """現在のExposureとGainを返す（設定済みならカメラには問い合わせない）
         """
-        img = average_shot(Camera, average)
-        Camera.StopLive()
+        return self.properties.get("Exposure", "Value"), self.properties.get("Gain", "Value")
+
+    def bracket(self, average=1, bracket=3, stack="mean"):
+        """ライブ映像を止めずに露光時間を変えて撮影する
+        Params:
+            average: 露光時間ごとの撮影枚数
+            bracket: BRACKET_TABLESのキー，または基準の露光時間に掛ける倍率のリスト
+            stack: 複数枚撮影の合成方式
+        Returns:
+            (露光時間の短い順の画像リスト, 露光時間のfloat32配列)
+        """
+        if isinstance(bracket, int):
+            if bracket not in BRACKET_TABLES:
+                raise ValueError("unknown bracket: %s (%s)" % (bracket, ", ".join(map(str, BRACKET_TABLES))))
+            ratios = BRACKET_TABLES[bracket]
+        else:
+            ratios = tuple(bracket)
+        stacker = self.stacker(stack)
+        self.start()
+        exposure_ref, gain_ref = self.reference()
+
+        # 今の設定のまま撮れる基準露光を最初に撮り，設定の切り替えを1回減らす
+        order = sorted(range(len(ratios)), key=lambda i: (ratios[i] != 1.0, ratios[i]))
+        shots = {}
+        for i in order:
+            self.set_properties(exposure_ref*ratios[i], gain_ref)
+            self.settle_frames()
+            shots[i] = average_shot(self.Camera, average, stacker, metrics=self.metrics)
+
+        #次の撮影のためにExposureを元に戻す（捨てるフレームは次の撮影時に撮る）
+        self.set_properties(exposure_ref, gain_ref)
+
+        index = sorted(range(len(ratios)), key=lambda i: ratios[i])
+        exposure_table = np.array([exposure_ref*ratios[i] for i in index], dtype=np.float32)
+        return [shots[i] for i in index], exposure_table
+
+    def stacker(self, stack):
+        """合成方式ごとのインスタンスを返す（バッファを使い回すため保持しておく）
+        """
+        if stack not in self.stackers:
+            self.stackers[stack] = make_stacker(stack)
+        return self.stackers[stack]
+
+    def capture(self, Exposure=0, Gain=0, average=1, HDR=False, stack="mean", bracket=3):
+        """撮影する（引数はcapture()と同じ）
+        """
+        stacker = self.stacker(stack)
+        metrics = self.metrics
+        self.start()
+        with metrics.stage("properties"):
+            self.set_properties(Exposure, Gain)
+        if HDR==False:
+            """通常撮影モード
+            """
+            self.settle_frames()
+            out = None
+            if self.pool is not None:
+                # バッファが全て保存待ちなら空くまで待つ
+                with metrics.stage("acquire"):
+                    out = self.pool.acquire(*image_format(self.Camera))
+            try:
+                img = average_shot(self.Camera, average, stacker, out, metrics)
+            except Exception:
+                if out is not None:
+                    self.pool.release(out)
+                raise
+        else:
+            """HDR撮影モード
+            """
+            img_list, exposure_table = self.bracket(average, bracket, stack)
+            with metrics.stage("hdr_merge"):
+                if img_list[0].shape[2] == 1:
+                    img_list = [debayer(img) for img in img_list]
+                img = merge_hdr(img_list, exposure_table, self.response)
+        metrics.frame()
         return img
-    else:
-        """HDR撮影モード
-        """
-        #デフォルトのExposureとGainを取得
-        str_value=[0]
-        Camera.GetPropertyAbsoluteValue("Exposure", "Value", str_value)
-        exposure_ref = str_value[0]
-        gain_ref = Camera.GetPropertyValue("Gain", "Value")
-
-        #Exposureのテーブルを作成
-        exposure_table = np.array([exposure_ref*0.5, exposure_ref, exposure_ref*2.0], dtype=np.float32)
-        #exposure_table = np.array([exposure_ref*0.25, exposure_ref*0.5, exposure_ref, exposure_ref*2.0, exposure_ref*4.0], dtype=np.float32)
-        N = len(exposure_table)
-        img_list = []
-        for i in range(N):
-            set_properties(Camera, exposure_table[i], gain_ref)
-            img = average_shot(Camera, average)
-            Camera.StopLive()
-            img_list.append(img)
-        
-        merge = cv2.createMergeDebevec()
-        hdr = merge.process(img_list, times=exposure_table.copy())
-        return hdr
\ No newline at end of file
+
+
+class TriggerSession(object):
+    """トリガーモードで撮影する
+
+    arm()でTriggerプロパティを有効にしてフレーム到着コールバックの受信を1回だけ開始し，
+    その後はトリガーごとに露光されたフレームをコールバック経由で受け取る．
+    SnapImageのように撮影の要求からフレームの到着までを待たないので，露光の時刻が決まる．
+
+    使い方:
+        with TriggerSession(Camera) as session:
+            frames = session.burst(5)             # ソフトウェアトリガーを5回送る
+            frames = session.wait(5, timeout=10)  # ハードウェアトリガーで届く5枚を待つ
+    """
+    def __init__(self, Camera, buffers=8):
+        """
+        Params:
+            Camera: IC.TIS_CAM()で作成したインスタンス
+            buffers: フレーム受信のリングバッファの枚数
+        """
+        self.Camera = Camera
+        self.stream = FrameStream(Camera, buffers)
+        self.armed = False
+        # 受け取ったフレームを書き込むバッファプール（framePool.FramePool．Noneなら毎回確保する）
+        self.pool = None
+        # 直前のburst()でトリガーを送ってからフレームが届くまでの時間[sec]
+        self.latencies = []
+
+    def __enter__(self):
+        self.arm()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disarm()
+        return False
+
+    def arm(self):
+        """トリガーモードにしてフレームの受信を開始する（開始済みなら何もしない）
+        """
+        if not self.armed:
+            self.Camera.EnableTrigger(1)
+            self.stream.start()
+            self.armed = True
+
+    def disarm(self):
+        """受信を停止してトリガーモードを解除する
+        """
+        if self.armed:
+            self.stream.stop()
+            self.Camera.EnableTrigger(0)
+            self.armed = False
+
+    def _drain(self):
+        """前のトリガーで届いて受け取っていないフレームを捨てる
+        """
+        while self.stream.get_frame(block=False) is not None:
+            pass
+        self.stream.release()
+
+    def _collect(self, timeout):
+        """届いたフレームを上下反転してコピーし，リングバッファをすぐ返す
+        """
+        frame = self.stream.get_frame(timeout=timeout)
+        if frame is None:
+            raise TimeoutError("no triggered frame within %s sec" % timeout)
+        shape, dtype = frame.image.shape, frame.image.dtype
+        out = np.empty(shape, dtype) if self.pool is None else self.pool.acquire(shape, dtype)
+        np.copyto(out, frame.image[::-1])
+        self.stream.release()
+        return Frame(frame.number, out, frame.timestamp)
+
+    def burst(self, count=1, interval=0, timeout=returnErrorTime/1000):
+        """ソフトウェアトリガーをcount回送り，露光されたフレームを返す
+        Params:
+            count: 撮影枚数
+            interval: トリガーの間隔[sec]（0ならフレームが届きしだい次を送る）
+            timeout: 1枚のフレームを待つ最大時間[sec]
+        Returns:
+            liveStream.Frameのリスト（画像は上下反転済み）
+        """
+        self.arm()
+        self._drain()
+        self.latencies = []
+        frames = []
+        start = time.monotonic()
+        for i in range(count):
+            delay = start + i*interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            fired = time.monotonic()
+            self.Camera.SoftwareTrigger()
+            frame = self._collect(timeout)
+            self.latencies.append(frame.timestamp - fired)
+            frames.append(frame)
+        return frames
+
+    def wait(self, count=1, timeout=None):
+        """ハードウェアトリガーで届くフレームをcount枚待って返す
+        Params:
+            timeout: 1枚のフレームを待つ最大時間[sec]（Noneなら無制限）
+        """
+        self.arm()
+        return [self._collect(timeout) for i in range(count)]
+
+
+def capture(Camera, Exposure=0, Gain=0, average=1, HDR=False, stack="mean", bracket=3):
+    """
+    Params:
+        Camera: IC.TIS_CAM()で作成したインスタンス
+        Exposure: 露光時間
+        Gain: ゲイン
+        average: 複数枚撮影の枚数（引数で入力されない場合ワンショットになる）
+        HDR: Trueにすると，露光時間を変えて複数枚撮影しDebevecの手法でHDR合成する(デフォルトではFalse)
+        stack: 複数枚撮影の合成方式 "mean", "median", "sigma", "min", "max"（デフォルトは平均）
+        bracket: HDR撮影の露光倍率 3（0.5, 1, 2倍），5（0.25〜4倍），または倍率のリスト
+
+    1枚ごとにライブ映像を開始・停止する．連続撮影する場合はCaptureSessionを使う
+    """
+    with CaptureSession(Camera) as session:
+        return session.capture(Exposure, Gain, average, HDR, stack, bracket)
\ No newline at end of file
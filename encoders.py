@@ -0,0 +1,161 @@
+"""
+    画像の保存形式（エンコーダ）
+
+    保存形式ごとの書き込み方法とパラメータをまとめる．SaveWorkerに渡して使う．
+
+    - "jpeg":   JPEG（品質はdefine.compressionRate，optimize/progressiveを指定できる）
+    - "png":    PNG（圧縮レベル0〜9．16bitのまま保存できる）
+    - "tiff":   TIFF（既定は無圧縮．16bitのまま保存できる）
+    - "npy":    numpyの.npy（エンコードしないので最も速い）
+    - "native": TIS_CAM.SaveImage（DLL側でJPEG/BMPを書く．最後に撮影した画像を保存する）
+
+    使い方:
+        encoder = make_encoder("jpeg", quality=95)
+        encoder.write("a" + encoder.extension, frame)
+"""
+import io
+
+import cv2
+import numpy as np
+
+from define import *
+
+
+class Encoder(object):
+    """保存形式の共通部分
+    extension: 拡張子
+    inline: Trueなら撮影したスレッドで直ちに書き込む必要がある
+    can_encode: Falseならファイルにしか書けない（encodeはTypeError）
+    """
+    extension = ""
+    inline = False
+    can_encode = True
+
+    def params(self):
+        """cv2.imwriteに渡すパラメータ
+        """
+        return []
+
+    def encode(self, frame):
+        """frameをエンコードしたバイト列を返す（ファイルに書かずにエンコードの時間を測るときなど）
+        can_encodeがFalseのエンコーダはファイルにしか書けないのでTypeError
+        """
+        ok, buf = cv2.imencode(self.extension, frame, self.params())
+        if not ok:
+            raise ValueError("could not encode frame as " + self.extension)
+        return buf.tobytes()
+
+    def write(self, fileName, frame):
+        """frameをfileNameに保存する．成功したらTrue
+        """
+        return cv2.imwrite(fileName, frame, self.params())
+
+
+class JpegEncoder(Encoder):
+    extension = ".jpg"
+
+    def __init__(self, quality=compressionRate, optimize=False, progressive=False):
+        """
+        Params:
+            quality: 品質 0〜100
+            optimize: Trueならハフマン符号を最適化する（少し小さく，少し遅くなる）
+            progressive: Trueならプログレッシブ形式にする
+        """
+        self.quality = quality
+        self.optimize = optimize
+        self.progressive = progressive
+
+    def params(self):
+        return [cv2.IMWRITE_JPEG_QUALITY, int(self.quality),
+                cv2.IMWRITE_JPEG_OPTIMIZE, int(self.optimize),
+                cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive)]
+
+
+class PngEncoder(Encoder):
+    extension = ".png"
+
+    def __init__(self, level=1):
+        """
+        Params:
+            level: 圧縮レベル 0（無圧縮）〜9（最小・最も遅い）
+        """
+        self.level = level
+
+    def params(self):
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(self.level)]
+
+
+class TiffEncoder(Encoder):
+    extension = ".tif"
+
+    def __init__(self, compression=1):
+        """
+        Params:
+            compression: libtiffの圧縮方式（1: 無圧縮，5: LZW，8: Deflate）
+        """
+        self.compression = compression
+
+    def params(self):
+        return [cv2.IMWRITE_TIFF_COMPRESSION, int(self.compression)]
+
+
+class NpyEncoder(Encoder):
+    """配列をそのまま.npyに書き出す（np.loadで読める）
+    """
+    extension = ".npy"
+
+    def encode(self, frame):
+        f = io.BytesIO()
+        np.save(f, frame)
+        return f.getvalue()
+
+    def write(self, fileName, frame):
+        # np.saveは拡張子が無いと付け足すので，ファイルを開いてから渡す
+        with open(fileName, "wb") as f:
+            np.save(f, frame)
+        return True
+
+
+class NativeEncoder(Encoder):
+    """TIS_CAM.SaveImageで保存する
+    DLLの画像バッファ（最後にSnapImageした画像）を書くので，渡したframeは使わない．
+    次の撮影で上書きされる前に書く必要があるため，SaveWorkerは撮影したスレッドで書き込む
+    """
+    inline = True
+    can_encode = False
+
+    def __init__(self, Camera, file_type="JPEG", quality=compressionRate):
+        """
+        Params:
+            Camera: IC.TIS_CAM()で作成したインスタンス
+            file_type: "JPEG"または"BMP"
+            quality: JPEGの品質 0〜100
+        """
+        self.Camera = Camera
+        self.file_type = file_type
+        self.quality = quality
+        self.extension = ".jpg" if file_type == "JPEG" else ".bmp"
+
+    def encode(self, frame):
+        raise TypeError("SaveImage writes files only")
+
+    def write(self, fileName, frame):
+        return self.Camera.SaveImage(fileName, self.file_type, self.quality) == 1
+
+
+ENCODERS = {"jpeg": JpegEncoder,
+            "png": PngEncoder,
+            "tiff": TiffEncoder,
+            "npy": NpyEncoder,
+            "native": NativeEncoder}
+
+
+def make_encoder(name, *args, **options):
+    """名前から保存形式を作る
+    Params:
+        name: ENCODERSのキー
+        args, options: 各エンコーダの引数（nativeはCameraが必要）
+    """
+    if name not in ENCODERS:
+        raise ValueError("unknown encoder: " + str(name))
+    return ENCODERS[name](*args, **options)
@@ -0,0 +1,220 @@
+"""
+    撮影したフレームを1つのファイルにまとめて保存する（メモリマップ）
+
+    最初にcapacity枚分の領域を確保したファイルをメモリマップし，フレームを無圧縮で追記していく．
+    1枚ごとにファイルを作らず，エンコードもしないので，センサのフレームレートで連写できる．
+    JPEGなどへの書き出しは撮影後にArchiveReader.export()で行う．
+
+    ファイルの構成:
+        ヘッダ（HEADER_BYTES）: 識別子，幅，高さ，チャンネル数，画素の型，画素形式，容量，記録枚数など
+        索引（capacity件）: フレームごとの時刻，Exposure，Gain，フレーム番号
+        フレーム（capacity枚）: 先頭をALIGNMENTの倍数にそろえて並べる
+
+    使い方:
+        with ArchiveWriter("burst.tisarc", (3000, 4096, 3), capacity=1000) as archive:
+            archive.append(frame, exposure=0.01, gain=10)
+            Camera.GetImageInto(archive.reserve())   # コピー1回で直接書き込む
+        with ArchiveReader("burst.tisarc") as archive:
+            for i in range(len(archive)):
+                img = archive[i]                    # コピーしないビュー
+        python frameArchive.py burst.tisarc 出力フォルダ [保存形式]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from framePool import ALIGNMENT
+
+MAGIC = b"TISARC01"
+HEADER_BYTES = 4096
+ARCHIVE_EXTENSION = ".tisarc"
+
+HEADER_DTYPE = np.dtype([("magic", "S8"),
+                         ("width", "<u4"),
+                         ("height", "<u4"),
+                         ("channels", "<u4"),
+                         ("dtype", "S8"),
+                         ("format", "<i4"),
+                         ("bottom_up", "<u4"),
+                         ("capacity", "<u8"),
+                         ("count", "<u8"),
+                         ("frame_bytes", "<u8"),
+                         ("stride", "<u8"),
+                         ("data_offset", "<u8")])
+
+# timestamp: 撮影時刻(time.time), exposure: 露光時間, gain: ゲイン, number: フレーム番号
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"),
+                        ("exposure", "<f8"),
+                        ("gain", "<f8"),
+                        ("number", "<u8")])
+
+
+class ArchiveFullError(RuntimeError):
+    """確保した枚数を使い切った
+    """
+    pass
+
+
+def _round_up(value, align):
+    return (value + align - 1)//align*align
+
+
+class _Archive(object):
+    """ArchiveWriterとArchiveReaderの共通部分
+    """
+    def _map(self, path, mode, size=None):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode=mode, shape=size)
+        self.header = self._mm[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+        if mode != "w+" and self.header["magic"][0] != MAGIC:
+            raise ValueError(path + " is not a frame archive")
+
+    def _layout(self):
+        h = self.header[0]
+        self.shape = (int(h["height"]), int(h["width"]), int(h["channels"]))
+        self.dtype = np.dtype(h["dtype"].decode())
+        self.capacity = int(h["capacity"])
+        self.bottom_up = bool(h["bottom_up"])
+        self._frame_bytes = int(h["frame_bytes"])
+        self._stride = int(h["stride"])
+        self._data_offset = int(h["data_offset"])
+        self.index = self._mm[HEADER_BYTES:HEADER_BYTES + self.capacity*INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __len__(self):
+        return int(self.header["count"][0])
+
+    def _view(self, i):
+        """i枚目の領域のビュー（保存したときの向きのまま）
+        """
+        return np.ndarray(self.shape, self.dtype, buffer=self._mm,
+                          offset=self._data_offset + i*self._stride)
+
+
+class ArchiveWriter(_Archive):
+    """フレームを追記する
+    """
+    def __init__(self, path, shape, dtype=np.uint8, capacity=1000, cformat=1, bottom_up=False):
+        """
+        Params:
+            path: 保存するファイル名（既にあれば上書きする）
+            shape: フレームの形 (height, width, channels)
+            dtype: 画素の型（Y16ならuint16）
+            capacity: 確保する枚数
+            cformat: 画素形式（tisgrabber.SinkFormatsの値）
+            bottom_up: TrueならDLLのバッファと同じ上下反転した向きで保存する（読むときに戻す）
+        """
+        dtype = np.dtype(dtype)
+        height, width, channels = shape
+        frame_bytes = height*width*channels*dtype.itemsize
+        stride = _round_up(frame_bytes, ALIGNMENT)
+        data_offset = _round_up(HEADER_BYTES + capacity*INDEX_DTYPE.itemsize, ALIGNMENT)
+        self._map(path, "w+", data_offset + capacity*stride)
+        self.header[0] = (MAGIC, width, height, channels, dtype.str.encode(), cformat,
+                          bottom_up, capacity, 0, frame_bytes, stride, data_offset)
+        self._layout()
+        self._count = 0
+
+    def reserve(self, timestamp=None, exposure=0, gain=0, number=None):
+        """次の1枚の領域を確保して書き込み可能なビューを返す（GetImageIntoなどで直接書く）
+        Params:
+            timestamp: 撮影時刻(time.time)．Noneなら現在時刻
+            exposure, gain: 撮影時の設定
+            number: フレーム番号．Noneなら通し番号
+        """
+        if self._count >= self.capacity:
+            raise ArchiveFullError("archive is full (%d frames)" % self.capacity)
+        i = self._count
+        self.index[i] = (time.time() if timestamp is None else timestamp,
+                         exposure, gain, i if number is None else number)
+        self._count += 1
+        # 記録枚数は毎回ヘッダに書くので，途中で止まってもそこまでは読める
+        self.header["count"] = self._count
+        return self._view(i)
+
+    def append(self, frame, timestamp=None, exposure=0, gain=0, number=None):
+        """フレームをコピーして追記する（引数はreserve()と同じ）
+        """
+        out = self.reserve(timestamp, exposure, gain, number)
+        out[...] = frame.reshape(self.shape)
+        return out
+
+    def remaining(self):
+        """追記できる残りの枚数
+        """
+        return self.capacity - self._count
+
+    def close(self, truncate=True):
+        """書き込みを終える
+        truncateがTrueなら使わなかった領域をファイルから切り詰める
+        """
+        if self._mm is None:
+            return
+        self._mm.flush()
+        size = self._data_offset + self._count*self._stride
+        self.index = self.header = None
+        self._mm = None
+        if truncate:
+            try:
+                os.truncate(self.path, size)
+            except OSError:
+                # reserve()のビューが残っていてマップが閉じられない（Windows）．記録枚数までは読める
+                pass
+
+
+class ArchiveReader(_Archive):
+    """保存したフレームをコピーせずに読む
+    """
+    def __init__(self, path):
+        self._map(path, "r")
+        self._layout()
+
+    def __getitem__(self, i):
+        """i枚目のフレーム（書き込み不可のビュー．上下の向きは撮影画像と同じ）
+        """
+        if not -len(self) <= i < len(self):
+            raise IndexError("frame %d out of range" % i)
+        img = self._view(i % len(self))
+        return img[::-1] if self.bottom_up else img
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def info(self, i):
+        """i枚目の撮影時刻，Exposure，Gain，フレーム番号
+        """
+        return self.index[i]
+
+    def export(self, folder, encoder, prefix="frame_"):
+        """全フレームをencoderの形式で1枚ずつ書き出し，書き出した枚数を返す
+        """
+        os.makedirs(folder, exist_ok=True)
+        count = 0
+        for i in range(len(self)):
+            fileName = os.path.join(folder, prefix + str(int(self.index[i]["number"])) + encoder.extension)
+            if encoder.write(fileName, self[i]):
+                count += 1
+        return count
+
+    def close(self):
+        self.index = self.header = None
+        self._mm = None
+
+
+if __name__ == "__main__":
+    from encoders import make_encoder
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    with ArchiveReader(sys.argv[1]) as archive:
+        encoder = make_encoder(sys.argv[3] if len(sys.argv) > 3 else "jpeg")
+        print(str(archive.export(sys.argv[2], encoder)) + " frames exported")
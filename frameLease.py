@@ -0,0 +1,116 @@
+"""
+    カメラの画像バッファを安全に受け渡す
+
+    TIS_CAM.GetImage/GetImageExの配列はDLLの画像バッファそのものなので，
+    次のSnapImageで中身が書き換わる．別スレッドでエンコード中の画像が壊れないように，
+    次のどちらかで画像を受け取る．
+
+    - snap():      コピーせずにバッファを借りる（FrameLease）．返却するまで次の撮影は待つ．
+                   返却後にimageを読むとStaleFrameErrorになる．
+    - snap_into(): 呼び出し側の配列（バッファプールなど）にコピーする．撮影はすぐ次へ進める．
+    SnapImageが失敗したら，前のフレームを新しいフレームとして渡さないようRuntimeErrorにする．
+
+    使い方:
+        source = FrameSource(Camera)
+        with source.snap() as frame:
+            cv2.imwrite("a.bmp", frame.image)
+"""
+import threading
+
+from tisgrabber import IC_SUCCESS
+
+
+class StaleFrameError(RuntimeError):
+    """返却済み（または上書き済み）のフレームを使おうとした
+    """
+    pass
+
+
+class FrameLease(object):
+    """カメラの画像バッファを借りている間だけ有効なフレーム
+    """
+    def __init__(self, source, image, number):
+        self._source = source
+        self._image = image
+        self.number = number
+        self.released = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+    @property
+    def image(self):
+        """画像（書き込み不可のビュー）．返却後に読むとStaleFrameError
+        """
+        if self.released or self.number != self._source.number:
+            raise StaleFrameError("frame %d is no longer valid" % self.number)
+        return self._image
+
+    def copy_into(self, out):
+        """画像をoutにコピーして返す
+        """
+        out[...] = self.image
+        return out
+
+    def release(self):
+        """バッファを返却する（2回呼んでもよい）
+        """
+        if not self.released:
+            self.released = True
+            self._source._release()
+
+
+class FrameSource(object):
+    """撮影と画像バッファの貸し出しを管理する
+    """
+    def __init__(self, Camera):
+        """
+        Params:
+            Camera: IC.TIS_CAM()で作成したインスタンス（ライブ映像は開始しておく）
+        """
+        self.Camera = Camera
+        self.number = 0
+        self.leased = 0
+        self._cond = threading.Condition()
+
+    def _release(self):
+        with self._cond:
+            self.leased -= 1
+            self._cond.notify_all()
+
+    def _snap(self, timeout):
+        """貸し出し中のバッファが全て返却されるまで待ってから撮影する
+        SnapImageが失敗したら（フレームが届かない，再生が終わったなど）RuntimeError
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.leased == 0, timeout):
+                raise TimeoutError("frame %d has not been released" % self.number)
+            error = self.Camera.SnapImage()
+            if error != IC_SUCCESS:
+                raise RuntimeError("SnapImage failed (error %s)" % error)
+            self.number += 1
+
+    def snap(self, timeout=None):
+        """撮影してカメラの画像バッファを貸し出す（コピーしない）
+        Params:
+            timeout: 前のフレームの返却を待つ最大時間[sec]（Noneなら無制限）
+        Returns:
+            FrameLease．使い終わったらrelease()する
+        """
+        with self._cond:
+            self._snap(timeout)
+            image = self.Camera.GetImageEx().view()
+            image.flags.writeable = False
+            self.leased += 1
+            return FrameLease(self, image, self.number)
+
+    def snap_into(self, out, timeout=None):
+        """撮影して画像をoutにコピーして返す
+        """
+        with self._cond:
+            self._snap(timeout)
+            return self.Camera.GetImageInto(out)
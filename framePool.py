@@ -0,0 +1,89 @@
+"""
+    画像バッファのプール
+
+    撮影から保存までのフレームを毎回確保し直さずに，決まった枚数のバッファを使い回す．
+    バッファの形と型（画像のフォーマット）が変わったときだけ確保し直す．
+
+    使い方:
+        pool = FramePool(8)
+        img = pool.acquire((3000, 4096, 3))   # 空きが無ければ返却されるまで待つ
+        ...
+        pool.release(img)
+"""
+import threading
+
+import numpy as np
+
+ALIGNMENT = 64 # バッファの先頭アドレスの境界[byte]
+
+
+def aligned_empty(shape, dtype=np.uint8, align=ALIGNMENT):
+    """先頭アドレスがalignの倍数になる未初期化の配列を作る
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape))*dtype.itemsize
+    raw = np.empty(nbytes + align, dtype=np.uint8)
+    offset = (-raw.ctypes.data) % align
+    return raw[offset:offset + nbytes].view(dtype).reshape(shape)
+
+
+class FramePool(object):
+    """決まった枚数の画像バッファを貸し出す
+    """
+    def __init__(self, count=8, align=ALIGNMENT):
+        """
+        Params:
+            count: バッファの枚数
+            align: バッファの先頭アドレスの境界[byte]
+        """
+        self.count = count
+        self.align = align
+        self.key = None
+        self._free = []
+        self._owned = {}
+        self._lent = set()
+        self._cond = threading.Condition()
+
+    def _allocate(self, key):
+        """形と型が変わったのでバッファを確保し直す
+        貸し出し中の古いバッファは返却されても捨てる
+        """
+        shape, dtype = key
+        self.key = key
+        self._free = [aligned_empty(shape, dtype, self.align) for i in range(self.count)]
+        self._owned = {id(img): img for img in self._free}
+        self._lent = set()
+
+    def acquire(self, shape, dtype=np.uint8, timeout=None):
+        """バッファを1枚借りる
+        Params:
+            shape: 画像の形 (height, width, channels)
+            dtype: 画像の型
+            timeout: 空きを待つ最大時間[sec]（Noneなら無制限）
+        """
+        key = (tuple(shape), np.dtype(dtype))
+        with self._cond:
+            if key != self.key:
+                self._allocate(key)
+            if not self._cond.wait_for(lambda: self._free, timeout):
+                raise TimeoutError("no free frame buffer in the pool")
+            img = self._free.pop()
+            self._lent.add(id(img))
+            return img
+
+    def release(self, img):
+        """借りたバッファを返す
+        貸し出し中でないバッファ（このプールのもの以外や，既に返却されたもの）は無視する
+        （2回返すと2人に貸し出してしまうため）
+        """
+        with self._cond:
+            if id(img) in self._lent and self._owned.get(id(img)) is img:
+                self._lent.remove(id(img))
+                self._free.append(img)
+                self._cond.notify()
+
+    def available(self):
+        """空いているバッファの枚数
+        """
+        with self._cond:
+            return len(self._free)
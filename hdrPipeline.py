@@ -0,0 +1,161 @@
+"""
+    HDR合成を撮影と並行して行う
+
+    カメラの応答曲線はDebevecの手法で1回だけ推定し，カメラごとにファイルへ保存して使い回す．
+    合成（MergeDebevec）とトーンマッピングは別スレッドで行い，
+    放射輝度マップ（.hdr）と確認用の8bit画像（.jpg）を書き出す．
+    Y16の画像はセンサの値が露光量に比例するので，応答曲線を使わずに線形に合成する．
+    ベイヤー配列のままの画像は合成前にデモザイクする．
+
+    OpenCVの合成・トーンマッピングはGILを解放するので，スレッドでも並列に動く．
+    takePic.pyのようにif __name__ == "__main__"の無いスクリプトからプロセスプールを使うと，
+    Windowsでは子プロセスがスクリプトを最初から実行し直してしまうためスレッドを使う．
+
+    使い方:
+        hdr = HDRPipeline("DFK 38UX304")
+        img_list, times = session.bracket()
+        hdr.submit("./out/hdr_0", img_list, times)
+        hdr.close()
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from debayer import debayer
+
+RESPONSE_DIR = "./hdr_response" # 応答曲線の保存先ディレクトリ
+RADIANCE_EXTENSION = ".hdr"
+PREVIEW_EXTENSION = ".jpg"
+
+
+def response_path(camera_name, cache_dir=RESPONSE_DIR):
+    """カメラ名から応答曲線のファイル名を作る
+    """
+    safe = "".join(c if c.isalnum() else "_" for c in camera_name)
+    return os.path.join(cache_dir, "response_" + safe + ".npy")
+
+
+def load_response(camera_name, cache_dir=RESPONSE_DIR):
+    """保存済みの応答曲線を読む．無ければNone
+    """
+    path = response_path(camera_name, cache_dir)
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+
+def calibrate_response(camera_name, img_list, times, cache_dir=RESPONSE_DIR):
+    """応答曲線を推定してファイルに保存する
+    """
+    calibrate = cv2.createCalibrateDebevec()
+    response = calibrate.process(img_list, times=times.copy())
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(response_path(camera_name, cache_dir), response)
+    return response
+
+
+def merge_linear(img_list, times):
+    """線形なセンサ値(uint16)から放射輝度マップ(float32)を作る
+    各画素を露光時間で割り，白飛び・黒つぶれに近い値ほど軽くなる三角形の重みで平均する
+    """
+    peak = float(np.iinfo(img_list[0].dtype).max)
+    acc = np.zeros(img_list[0].shape, dtype=np.float32)
+    weight_sum = np.zeros(img_list[0].shape, dtype=np.float32)
+    for img, t in zip(img_list, times):
+        value = img.astype(np.float32)
+        weight = 1.0 - np.abs(value*(2.0/peak) - 1.0)
+        weight_sum += weight
+        value *= weight
+        acc += value/(float(t)*peak)
+    np.maximum(weight_sum, 1e-6, out=weight_sum)
+    return acc/weight_sum
+
+
+def merge_hdr(img_list, times, response=None):
+    """放射輝度マップ(float32)を作る
+    uint8の画像はDebevecの手法，uint16の画像はmerge_linearで合成する
+    """
+    if img_list[0].dtype != np.uint8:
+        return merge_linear(img_list, times)
+    merge = cv2.createMergeDebevec()
+    if response is None:
+        return merge.process(img_list, times=times.copy())
+    return merge.process(img_list, times=times.copy(), response=response)
+
+
+def tonemap(hdr, gamma=2.2):
+    """放射輝度マップを表示・確認用の8bit画像にする
+    """
+    ldr = cv2.createTonemapReinhard(gamma).process(hdr)
+    ldr = np.nan_to_num(ldr, copy=False)
+    ldr *= 255
+    return np.clip(ldr, 0, 255).astype(np.uint8)
+
+
+class HDRPipeline(object):
+    """HDR合成と書き出しを行うワーカープール
+    """
+    def __init__(self, camera_name, workers=2, max_pending=4, cache_dir=RESPONSE_DIR, gamma=2.2, on_saved=None):
+        """
+        Params:
+            camera_name: 応答曲線を保存するときのカメラ名
+            workers: 合成スレッドの数
+            max_pending: 合成待ちの最大数（これを超えるとsubmitが待つ）
+            cache_dir: 応答曲線の保存先ディレクトリ
+            gamma: トーンマッピングのガンマ
+            on_saved: 書き出し完了時に呼ばれる関数 on_saved(base_name)
+        """
+        self.camera_name = camera_name
+        self.cache_dir = cache_dir
+        self.gamma = gamma
+        self.on_saved = on_saved
+        self.response = load_response(camera_name, cache_dir)
+        self._pool = ThreadPoolExecutor(workers)
+        self._slots = threading.Semaphore(max_pending)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _response(self, img_list, times):
+        """応答曲線を返す．まだ無ければ最初のブラケットから推定する
+        """
+        with self._lock:
+            if self.response is None:
+                self.response = calibrate_response(self.camera_name, img_list, times, self.cache_dir)
+            return self.response
+
+    def _process(self, base_name, img_list, times):
+        try:
+            if img_list[0].ndim == 2 or img_list[0].shape[2] == 1:
+                img_list = [debayer(img) for img in img_list]
+            response = self._response(img_list, times) if img_list[0].dtype == np.uint8 else None
+            hdr = merge_hdr(img_list, times, response)
+            cv2.imwrite(base_name + RADIANCE_EXTENSION, hdr)
+            cv2.imwrite(base_name + PREVIEW_EXTENSION, tonemap(hdr, self.gamma))
+            if self.on_saved is not None:
+                self.on_saved(base_name)
+        except Exception as ex:
+            print(base_name + " HDR failed: " + str(ex), file=sys.stderr)
+        finally:
+            self._slots.release()
+
+    def submit(self, base_name, img_list, times):
+        """ブラケット画像を合成待ちに入れる（拡張子はbase_nameに付けない）
+        img_listは合成が終わるまで書き換えないこと
+        """
+        self._slots.acquire()
+        return self._pool.submit(self._process, base_name, img_list, times)
+
+    def close(self):
+        """合成待ちを全て書き出してから終了する
+        """
+        self._pool.shutdown(wait=True)
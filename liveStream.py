@@ -0,0 +1,151 @@
+"""
+    フレーム到着コールバックによる連続取得
+
+    SnapImageで1枚ずつ要求する代わりに，カメラから届いたフレームを
+    SetFrameReadyCallbackで受け取り，事前に確保したリングバッファへコピーする．
+    カメラ本来のフレームレートで取得できる．
+
+    使い方:
+        with FrameStream(Camera) as stream:
+            for frame in stream:
+                print(frame.number, frame.image.shape)
+"""
+import ctypes
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+import tisgrabber as tis
+
+# number: DLLが付けるフレーム番号, image: 画像(GetImageと同じく上下反転したまま), timestamp: 受信時刻(time.monotonic)
+Frame = namedtuple("Frame", ["number", "image", "timestamp"])
+
+
+class FrameStream(object):
+    """コールバック駆動の連続取得エンジン
+
+    get_frame()で返した画像は次のget_frame()（またはrelease()）まで有効．
+    リングバッファが全て使用中のときに届いたフレームは捨ててdroppedを数える．
+    DLL側のフレーム番号が飛んだ分はmissedに数える．
+    """
+    def __init__(self, Camera, buffers=8):
+        """
+        Params:
+            Camera: IC.TIS_CAM()で作成したインスタンス
+            buffers: リングバッファの枚数
+        """
+        self.Camera = Camera
+        self.buffers = buffers
+        self.dropped = 0
+        self.missed = 0
+        self.received = 0
+        self.running = False
+        self._cond = threading.Condition()
+        self._free = deque()
+        self._ready = deque()
+        self._lent = None
+        self._last_number = None
+        self._nbytes = 0
+        # コールバックがGCで解放されないようにインスタンスで保持する
+        self._callback = tis.TIS_GrabberDLL.FRAMEREADYCALLBACK(self._on_frame)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def __iter__(self):
+        while self.running:
+            frame = self.get_frame()
+            if frame is not None:
+                yield frame
+
+    def _allocate(self):
+        """現在の画像フォーマットに合わせてリングバッファを確保する
+        """
+        width, height, bits, cformat = self.Camera.GetImageDescription()
+        if cformat == tis.SinkFormats.Y16.value:
+            dtype, channels = np.uint16, 1
+        else:
+            dtype, channels = np.uint8, bits//8
+        self._free.clear()
+        self._ready.clear()
+        self._lent = None
+        for i in range(self.buffers):
+            self._free.append(np.empty((height, width, channels), dtype=dtype))
+        self._nbytes = self._free[0].nbytes
+
+    def start(self):
+        """コールバックを登録してライブ映像を開始する
+        """
+        if self.running:
+            return
+        self._allocate()
+        self.dropped = 0
+        self.missed = 0
+        self.received = 0
+        self._last_number = None
+        self.Camera.SetFrameReadyCallback(self._callback, self)
+        self.Camera.SetContinuousMode(0)
+        self.Camera.StartLive(0)
+        self.running = True
+
+    def stop(self):
+        """ライブ映像を停止し，待っているget_frame()を起こす
+        """
+        if not self.running:
+            return
+        self.Camera.StopLive()
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+
+    def _on_frame(self, hGrabber, pBuffer, framenumber, pData):
+        """DLLのスレッドから呼ばれる．空きバッファへコピーするだけですぐ戻る
+        """
+        timestamp = time.monotonic()
+        with self._cond:
+            self.received += 1
+            if self._last_number is not None and framenumber > self._last_number + 1:
+                self.missed += framenumber - self._last_number - 1
+            self._last_number = framenumber
+            if not self._free:
+                self.dropped += 1
+                return
+            image = self._free.popleft()
+        ctypes.memmove(image.ctypes.data, pBuffer, self._nbytes)
+        with self._cond:
+            self._ready.append(Frame(framenumber, image, timestamp))
+            self._cond.notify()
+
+    def release(self):
+        """get_frame()で受け取ったバッファを返却する
+        """
+        with self._cond:
+            if self._lent is not None:
+                self._free.append(self._lent)
+                self._lent = None
+
+    def get_frame(self, block=True, timeout=None):
+        """次のフレームを取り出す
+
+        Params:
+            block: Falseならフレームが無いときすぐNoneを返す
+            timeout: blockがTrueのときの最大待ち時間[sec]（Noneなら無制限）
+        Returns:
+            Frame，フレームが無ければNone
+        """
+        self.release()
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self._ready or not self.running, timeout)
+            if not self._ready:
+                return None
+            frame = self._ready.popleft()
+            self._lent = frame.image
+            return frame
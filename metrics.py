@@ -0,0 +1,294 @@
+"""
+    撮影パイプラインの段階ごとの処理時間を計る
+
+    段階（snap，get_image，stack，encodeなど）ごとに処理時間をtime.perf_counterで計り，
+    直近window回の分布（p50/p95/p99）と，これまでの回数・合計を記録する．
+    捨てたフレームの数（dropped）と，frame()を呼んだ間隔から実効fpsも記録する．
+    MetricsExporterは一定間隔でファイル（.csvまたは.jsonl）に書き出し，
+    Prometheusのテキスト形式（http://127.0.0.1:port/metrics）でも読めるようにする．
+
+    計らないときはNULL_METRICSを使う（何もしないので撮影ループの速度は変わらない）．
+
+    使い方:
+        metrics = Metrics()
+        with metrics.stage("snap"):
+            Camera.SnapImage()
+        metrics.frame()
+        with MetricsExporter(metrics, "metrics.jsonl", period=10, port=9108):
+            ...
+"""
+import csv
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = "tis_capture"
+
+
+class _Stage(object):
+    """with文の間の時間をMetricsに記録する
+    """
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics(object):
+    """段階ごとの処理時間，捨てたフレーム数，実効fpsを記録する（複数スレッドから呼んでよい）
+    """
+    def __init__(self, window=1000):
+        """
+        Params:
+            window: 分布とfpsの計算に使う直近の回数
+        """
+        self.window = window
+        self.started = time.time()
+        self.durations = {}
+        self.counts = {}
+        self.totals = {}
+        self.dropped = {}
+        self.frames = 0
+        self._frame_times = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """with文の間の時間を段階nameの処理時間として記録する
+        """
+        return _Stage(self, name)
+
+    def observe(self, name, seconds):
+        """段階nameの処理時間[sec]を記録する
+        """
+        with self._lock:
+            if name not in self.durations:
+                self.durations[name] = deque(maxlen=self.window)
+                self.counts[name] = 0
+                self.totals[name] = 0.0
+            self.durations[name].append(seconds)
+            self.counts[name] += 1
+            self.totals[name] += seconds
+
+    def drop(self, name, count=1):
+        """段階nameで捨てた（間に合わなかった，失敗した）フレームを数える
+        """
+        with self._lock:
+            self.dropped[name] = self.dropped.get(name, 0) + count
+
+    def frame(self):
+        """1フレーム撮影し終えたことを記録する（実効fpsの計算に使う）
+        """
+        with self._lock:
+            self.frames += 1
+            self._frame_times.append(time.perf_counter())
+
+    def fps(self):
+        """直近window回のframe()の間隔から求めた実効fps
+        """
+        with self._lock:
+            times = list(self._frame_times)
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1)/(times[-1] - times[0])
+
+    def snapshot(self):
+        """今の値をまとめた辞書を返す（時間は秒）
+        {"time", "frames", "fps", "dropped": {段階: 数},
+         "stages": {段階: {"count", "sum", "mean", "max", "p50", "p95", "p99"}}}
+        """
+        with self._lock:
+            recent = {name: np.array(d) for name, d in self.durations.items()}
+            counts = dict(self.counts)
+            totals = dict(self.totals)
+            dropped = dict(self.dropped)
+            frames = self.frames
+        stages = {}
+        for name, values in recent.items():
+            stage = {"count": counts[name], "sum": totals[name],
+                     "mean": float(values.mean()), "max": float(values.max())}
+            for q, v in zip(QUANTILES, np.quantile(values, QUANTILES)):
+                stage["p%d" % round(q*100)] = float(v)
+            stages[name] = stage
+        return {"time": time.time(), "frames": frames, "fps": self.fps(),
+                "dropped": dropped, "stages": stages}
+
+    def summary(self):
+        """段階ごとのp50/p95/p99[ms]を表にした文字列
+        """
+        snap = self.snapshot()
+        lines = ["%-12s %8s %8s %8s %8s" % ("stage", "count", "p50", "p95", "p99")]
+        for name, s in snap["stages"].items():
+            lines.append("%-12s %8d %8.2f %8.2f %8.2f" % (name, s["count"], s["p50"]*1000,
+                                                           s["p95"]*1000, s["p99"]*1000))
+        lines.append("fps: %.2f, dropped: %s" % (snap["fps"], snap["dropped"] or 0))
+        return "\n".join(lines)
+
+
+class NullMetrics(object):
+    """何も記録しないMetrics（計らないときに使う）
+    """
+    class _NullStage(object):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            return False
+
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def observe(self, name, seconds):
+        pass
+
+    def drop(self, name, count=1):
+        pass
+
+    def frame(self):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def prometheus_text(snap, prefix=METRIC_PREFIX):
+    """snapshot()の値をPrometheusのテキスト形式にする
+    """
+    lines = ["# TYPE %s_stage_seconds summary" % prefix]
+    for name, s in snap["stages"].items():
+        for q in QUANTILES:
+            lines.append('%s_stage_seconds{stage="%s",quantile="%s"} %.9f'
+                         % (prefix, name, q, s["p%d" % round(q*100)]))
+        lines.append('%s_stage_seconds_sum{stage="%s"} %.9f' % (prefix, name, s["sum"]))
+        lines.append('%s_stage_seconds_count{stage="%s"} %d' % (prefix, name, s["count"]))
+    lines.append("# TYPE %s_dropped_total counter" % prefix)
+    for name, count in snap["dropped"].items():
+        lines.append('%s_dropped_total{stage="%s"} %d' % (prefix, name, count))
+    lines.append("# TYPE %s_frames_total counter" % prefix)
+    lines.append("%s_frames_total %d" % (prefix, snap["frames"]))
+    lines.append("# TYPE %s_fps gauge" % prefix)
+    lines.append("%s_fps %.3f" % (prefix, snap["fps"]))
+    return "\n".join(lines) + "\n"
+
+
+def csv_rows(snap):
+    """snapshot()の値をCSVの行 (time, metric, stage, value) のリストにする
+    """
+    t = "%.3f" % snap["time"]
+    rows = [(t, "fps", "", "%.3f" % snap["fps"]), (t, "frames", "", snap["frames"])]
+    for name, s in snap["stages"].items():
+        for key in ("count", "mean", "p50", "p95", "p99", "max"):
+            value = s[key] if key == "count" else "%.6f" % s[key]
+            rows.append((t, key, name, value))
+    for name, count in snap["dropped"].items():
+        rows.append((t, "dropped", name, count))
+    return rows
+
+
+class MetricsExporter(object):
+    """一定間隔でMetricsをファイルに書き出し，Prometheus形式のテキストをHTTPで返す
+    """
+    def __init__(self, metrics, path=None, period=10.0, port=None, host="127.0.0.1"):
+        """
+        Params:
+            metrics: 書き出すMetrics
+            path: 書き出すファイル（拡張子が.csvならCSV，それ以外はJSONL．Noneなら書き出さない）
+            period: 書き出す間隔[sec]
+            port: HTTPで返すポート番号（Noneなら起動しない）
+            host: HTTPで待ち受けるアドレス（外から読ませないならlocalhostのまま）
+        """
+        self.metrics = metrics
+        self.path = path
+        self.period = period
+        self._stop = threading.Event()
+        self._file = None
+        self._writer = None
+        if path is not None:
+            self._file = open(path, "a", encoding="utf-8", newline="")
+            if path.endswith(".csv"):
+                self._writer = csv.writer(self._file)
+                if self._file.tell() == 0:
+                    self._writer.writerow(("time", "metric", "stage", "value"))
+        self._server = None
+        if port is not None:
+            self._server = ThreadingHTTPServer((host, port), self._handler())
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True).start()
+        self._thread = threading.Thread(target=self._run, name="MetricsExporter", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _handler(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = prometheus_text(metrics.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def write(self):
+        """今の値をファイルに書き出す
+        """
+        if self._file is None:
+            return
+        snap = self.metrics.snapshot()
+        try:
+            if self._writer is not None:
+                self._writer.writerows(csv_rows(snap))
+            else:
+                self._file.write(json.dumps(snap) + "\n")
+            self._file.flush()
+        except OSError as ex:
+            print(ex, file=sys.stderr)
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            self.write()
+
+    def close(self):
+        """最後の値を書き出して終了する
+        """
+        self._stop.set()
+        self._thread.join()
+        self.write()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
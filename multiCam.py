@@ -0,0 +1,185 @@
+"""
+    複数のカメラで同時に撮影する
+
+    接続されている（または指定した）全てのカメラを一意な名前（機種名とシリアル番号）で開き，
+    カメラごとの撮影スレッドで同時に撮影する．保存は全カメラで共通のSaveWorkerで行う．
+
+    1回の撮影（ラウンド）では全スレッドがバリアで待ち合わせてから一斉に撮影を始め，
+    待ち合わせが揃った時刻をそのラウンドの全フレームの共通の時刻にする．
+
+    使い方:
+        with CameraRig() as rig:                      # 接続されている全カメラ
+            shot = rig.capture(Exposure=0.01)
+            for name, img in shot.frames.items():
+                ...
+            rig.save(shot, "./out/", "top_", 0)
+"""
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import tisgrabber as tis
+from easyCap import CaptureSession
+from framePool import FramePool
+from saveWorker import SaveWorker
+
+# round: ラウンド番号, timestamp: 撮影開始の共通時刻(time.time), frames: {カメラ名: 画像}
+RigShot = namedtuple("RigShot", ["round", "timestamp", "frames"])
+
+
+def list_devices(backend=None, **keyargs):
+    """接続されているカメラの一意な名前のリスト
+    """
+    Camera = tis.TIS_CAM(backend, **keyargs)
+    return [d.decode("utf-8") if isinstance(d, bytes) else d for d in Camera.GetDevices()]
+
+
+def safe_name(name):
+    """カメラ名をファイル名・フォルダ名に使える形にする
+    """
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+class _CameraWorker(object):
+    """1台のカメラの撮影スレッド
+    """
+    def __init__(self, rig, name, Camera, buffers):
+        self.name = name
+        self.Camera = Camera
+        self.session = CaptureSession(Camera)
+        self.pool = FramePool(buffers)
+        self.session.pool = self.pool
+        self._rig = rig
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="CameraRig-" + name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            try:
+                self.session.start()
+                self._rig._barrier.wait()
+                result = self.session.capture(**request)
+            except Exception as ex:
+                # 他のカメラがバリアで待ち続けないようにする
+                self._rig._barrier.abort()
+                result = ex
+            self._rig._results.put((self.name, result))
+        self.session.stop()
+
+    def close(self):
+        self._requests.put(None)
+        self._thread.join()
+
+
+class CameraRig(object):
+    """複数カメラの撮影スレッドと共通の保存スレッドを管理する
+    """
+    def __init__(self, names=None, backend=None, save_workers=2, save_queue=8, encoder=None,
+                 on_saved=None, buffers=None, **keyargs):
+        """
+        Params:
+            names: 開くカメラの一意な名前のリスト（Noneなら接続されている全カメラ）
+            backend: TIS_CAMのバックエンド（"sim"など．Noneなら環境変数TIS_BACKEND）
+            save_workers: 保存スレッドの数
+            save_queue: 保存待ちフレームの最大数（全カメラ共通）
+            encoder: 保存形式（encoders.make_encoderで作ったもの）
+            on_saved: 保存完了時に呼ばれる関数 on_saved(fileName)
+            buffers: カメラごとのバッファプールの枚数（Noneなら保存待ち＋保存中＋撮影中の枚数）
+            keyargs: バックエンドに渡す引数（"sim"のwidthなど）
+        """
+        if names is None:
+            names = list_devices(backend, **keyargs)
+        if not names:
+            raise RuntimeError("no camera found")
+        if buffers is None:
+            buffers = save_queue + save_workers + 1
+        self.round = 0
+        self.saver = SaveWorker(save_workers, save_queue, on_saved, encoder)
+        self._results = queue.Queue()
+        self._timestamp = 0.0
+        self._barrier = threading.Barrier(len(names), action=self._release_round)
+        self.workers = []
+        for name in names:
+            Camera = tis.TIS_CAM(backend, **keyargs)
+            if Camera.open(name) != tis.IC_SUCCESS:
+                self.close()
+                raise RuntimeError("could not open " + name)
+            self.workers.append(_CameraWorker(self, name, Camera, buffers))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    @property
+    def names(self):
+        return [w.name for w in self.workers]
+
+    def _release_round(self):
+        """全カメラが揃ったときに1回だけ呼ばれる
+        """
+        self._timestamp = time.time()
+
+    def capture(self, **capture_args):
+        """全カメラで同時に撮影する
+        Params:
+            capture_args: CaptureSession.captureの引数（Exposure, Gain, averageなど）
+        Returns:
+            RigShot．画像はsave()に渡すか，release()でバッファを返す
+        """
+        for w in self.workers:
+            w._requests.put(capture_args)
+        frames = {}
+        errors = []
+        for i in range(len(self.workers)):
+            name, result = self._results.get()
+            if isinstance(result, Exception):
+                errors.append(name + ": " + (str(result) or type(result).__name__))
+            else:
+                frames[name] = result
+        shot = RigShot(self.round, self._timestamp, frames)
+        self.round += 1
+        if errors:
+            self._barrier.reset()
+            self.release(shot)
+            raise RuntimeError("capture failed: " + ", ".join(errors))
+        return shot
+
+    def save(self, shot, folder, prefix, number, extension=None):
+        """ラウンドの画像をカメラごとのフォルダに保存キューに入れる
+        ファイル名は folder/カメラ名/prefix+number+拡張子
+        """
+        extension = self.saver.encoder.extension if extension is None else extension
+        fileNames = []
+        for w in self.workers:
+            if w.name not in shot.frames:
+                continue
+            subfolder = os.path.join(folder, safe_name(w.name))
+            os.makedirs(subfolder, exist_ok=True)
+            fileName = os.path.join(subfolder, prefix + str(number) + extension)
+            self.saver.submit(fileName, shot.frames[w.name], w.pool.release)
+            fileNames.append(fileName)
+        return fileNames
+
+    def release(self, shot):
+        """保存しない画像のバッファを返す
+        """
+        for w in self.workers:
+            if w.name in shot.frames:
+                w.pool.release(shot.frames[w.name])
+
+    def close(self):
+        """保存待ちを全て書き込み，全カメラのライブ映像を停止する
+        """
+        for w in self.workers:
+            w.close()
+        self.workers = []
+        self.saver.close()
@@ -0,0 +1,128 @@
+"""
+    撮影とは別のスレッドで縮小したライブ映像を表示する
+
+    show()は縮小したコピーを作って最新フレームの置き場所に置くだけですぐ戻る．
+    表示スレッドは最新のフレームだけを表示し，表示が追いつかないときの古いフレームは捨てる．
+    cv2.imshowとcv2.waitKeyは表示スレッドでだけ呼ぶので，撮影ループは表示を待たない．
+
+    縮小方法:
+        "stride": 間引き（画素を飛ばして読むだけ．最も速い）
+        "area":   cv2.INTER_AREAによる平均（きれいだが全画素を読む）
+
+    使い方:
+        with Preview("camera", 0.25) as preview:
+            preview.show(frame)
+            key = preview.get_key()
+"""
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from metrics import NULL_METRICS
+
+
+def decimate(img, scale, method="stride"):
+    """画像をscale倍に縮小したコピーを返す
+    """
+    if scale >= 1:
+        return img.copy()
+    if method == "area":
+        return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    step = max(int(round(1/scale)), 1)
+    return np.ascontiguousarray(img[::step, ::step])
+
+
+class Preview(object):
+    """縮小したフレームを表示するスレッド
+    """
+    def __init__(self, window="camera", scale=0.25, method="stride", headless=False, period=0.03,
+                 metrics=NULL_METRICS):
+        """
+        Params:
+            window: ウィンドウ名
+            scale: 表示の倍率
+            method: 縮小方法 "stride"または"area"
+            headless: Trueならウィンドウを出さない（latest()で最新の縮小画像だけ取れる）
+            period: キー入力を確認する間隔[sec]
+            metrics: 縮小（preview）の時間と表示しなかったフレーム数の記録先（metrics.Metrics）
+        """
+        self.metrics = metrics
+        self.window = window
+        self.scale = scale
+        self.method = method
+        self.headless = headless
+        self.period = period
+        self.shown = 0
+        self.dropped = 0
+        self._frame = None
+        self._latest = None
+        self._cond = threading.Condition()
+        self._keys = queue.Queue()
+        self._running = True
+        self._thread = None
+        if not headless:
+            self._thread = threading.Thread(target=self._run, name="Preview", daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def show(self, frame):
+        """frameの縮小コピーを表示待ちにする（frameはすぐ書き換えてよい）
+        前のフレームがまだ表示されていなければ捨てる
+        """
+        with self.metrics.stage("preview"):
+            small = decimate(frame, self.scale, self.method)
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+                self.metrics.drop("preview")
+            self._frame = small
+            self._latest = small
+            self._cond.notify()
+
+    def latest(self):
+        """最後に渡された縮小画像（無ければNone）
+        """
+        with self._cond:
+            return self._latest
+
+    def get_key(self):
+        """表示ウィンドウで押されたキー（無ければ-1）
+        """
+        try:
+            return self._keys.get_nowait()
+        except queue.Empty:
+            return -1
+
+    def _run(self):
+        cv2.namedWindow(self.window, cv2.WINDOW_AUTOSIZE)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._frame is not None or not self._running, self.period)
+                if not self._running:
+                    break
+                frame, self._frame = self._frame, None
+            if frame is not None:
+                cv2.imshow(self.window, frame)
+                self.shown += 1
+            key = cv2.waitKey(1)
+            if key >= 0:
+                self._keys.put(key)
+        cv2.destroyWindow(self.window)
+
+    def close(self):
+        """表示スレッドを終了してウィンドウを閉じる
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,111 @@
+"""
+    カメラの設定を名前付きのプロファイルとして保存・切り替える
+
+    プロファイルはビデオフォーマット，フレームレート，画素形式（SinkFormats）と
+    プロパティ（Exposure，Gain，WhiteBalanceなど）をまとめたもので，PROFILE_DIRにJSONで保存する．
+    SaveDeviceStateToFileで保存したデバイス設定（XML）を元にすることもできる．
+    切り替えるときは今の設定と違う項目だけを書き込む．
+    ビデオフォーマット，フレームレート，画素形式，デバイス設定が変わるときだけライブ映像を止めて設定し直す．
+
+    使い方:
+        save_profile(Profile("preview", "RGB24 (1024x750)", 60.0, "RGB24",
+                             {"Exposure": {"Auto": 0, "Value": 0.005}, "Gain": {"Auto": 0, "Value": 0}}))
+        switcher = ProfileSwitcher(session)
+        switcher.apply(load_profile("preview"))
+        switcher.apply(load_profile("capture"))    # 違う項目だけ書き込む
+"""
+import json
+import os
+from collections import namedtuple
+
+import tisgrabber as tis
+
+PROFILE_DIR = "./profiles" # プロファイルの保存先ディレクトリ
+PROFILE_EXTENSION = ".json"
+
+# name: プロファイル名, video_format: "RGB24 (4096x3000)"など（Noneなら変えない）,
+# frame_rate: フレームレート（Noneなら変えない）, sink: SinkFormatsの名前（Noneなら変えない）,
+# properties: {Property: {Element: Value}}, device_state: 最初に読み込むデバイス設定のファイル（Noneなら読まない）
+Profile = namedtuple("Profile", ["name", "video_format", "frame_rate", "sink", "properties", "device_state"],
+                     defaults=[None])
+
+
+def profile_path(name, folder=PROFILE_DIR):
+    """プロファイル名からファイル名を作る
+    """
+    return os.path.join(folder, name + PROFILE_EXTENSION)
+
+
+def save_profile(profile, folder=PROFILE_DIR):
+    """プロファイルをファイルに保存する
+    """
+    os.makedirs(folder, exist_ok=True)
+    with open(profile_path(profile.name, folder), "w", encoding="utf-8") as f:
+        json.dump(profile._asdict(), f, indent=2, ensure_ascii=False)
+
+
+def load_profile(name, folder=PROFILE_DIR):
+    """保存したプロファイルを読む
+    """
+    with open(profile_path(name, folder), encoding="utf-8") as f:
+        values = json.load(f)
+    values["name"] = name
+    return Profile(**{field: values.get(field) for field in Profile._fields})
+
+
+def list_profiles(folder=PROFILE_DIR):
+    """保存されているプロファイル名のリスト
+    """
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(folder) if f.endswith(PROFILE_EXTENSION))
+
+
+def flatten_properties(properties):
+    """{Property: {Element: Value}} を {(Property, Element): Value} にする
+    """
+    return {(p, e): v for p, elements in (properties or {}).items() for e, v in elements.items()}
+
+
+class ProfileSwitcher(object):
+    """プロファイルを切り替える
+    """
+    def __init__(self, session):
+        """
+        Params:
+            session: easyCap.CaptureSession（ライブ映像の停止・再開とプロパティの書き込みに使う）
+        """
+        self.session = session
+        self.current = None
+
+    def _stream_changed(self, profile):
+        """ライブ映像を止めないと変えられない項目が変わるならTrue
+        """
+        fields = ("video_format", "frame_rate", "sink", "device_state")
+        if self.current is None:
+            return any(getattr(profile, f) is not None for f in fields)
+        return any(getattr(profile, f) is not None and getattr(profile, f) != getattr(self.current, f)
+                   for f in fields)
+
+    def apply(self, profile):
+        """プロファイルに切り替え，カメラに書き込んだ項目の数を返す
+        """
+        Camera = self.session.Camera
+        changes = 0
+        if self._stream_changed(profile):
+            live = self.session.live
+            self.session.stop()
+            if profile.device_state is not None:
+                Camera.LoadDeviceStateFromFile(profile.device_state)
+            if profile.video_format is not None:
+                Camera.SetVideoFormat(profile.video_format)
+            if profile.sink is not None:
+                Camera.SetFormat(tis.SinkFormats[profile.sink])
+            if profile.frame_rate is not None:
+                Camera.SetFrameRate(profile.frame_rate)
+            changes += 1
+            if live:
+                self.session.start()
+        changes += self.session.apply_properties(flatten_properties(profile.properties))
+        self.current = profile
+        return changes
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+# dfk module（DLLは最初にカメラを使うときに読み込まれる）
+import tisgrabber as tis
+
+from liveStream import FrameStream
+from videoRecorder import VideoRecorder
+
+#Create the camera object
+Camera = tis.TIS_CAM()
+
+#Set Property
+DEVICE_NAME = "DFK 38UX304"
+Camera.openVideoCaptureDevice(DEVICE_NAME)
+
+#デバイスが見つからなかったら処理を終える
+if Camera.IsDevValid() != 1:
+    print("no detect device")
+    sys.exit()
+
+
+# 変数設定
+FOLDER_NAME = "./top_video/" # 保存先ディレクトリ
+FILE_NAME = "top_video" # ファイル名（通し番号と拡張子が付く）
+FPS = 15.0 # 記録するフレームレート
+FOURCC = "MJPG" # コーデック
+CHUNK_FRAMES = None # 1ファイルの最大枚数（Noneなら制限しない）
+CHUNK_SEC = 600 # 1ファイルの最大秒数（Noneなら制限しない）
+STREAM_BUFFERS = 8 # フレーム受信のリングバッファの枚数
+
+# フォルダがなかったら作成
+os.makedirs(FOLDER_NAME, exist_ok=True)
+
+Camera.SetFrameRate(FPS)
+
+# 1ファイル書き終えたら表示する
+def on_chunk(fileName, frames):
+    print(f"{fileName} was saved ({frames} frames)", file=sys.stderr)
+
+recorder = VideoRecorder(FOLDER_NAME + FILE_NAME + "_" + time.strftime("%Y%m%d_%H%M%S"), FPS, FOURCC,
+                         chunk_frames=CHUNK_FRAMES, chunk_sec=CHUNK_SEC, on_chunk=on_chunk)
+stream = FrameStream(Camera, STREAM_BUFFERS)
+
+print("When you quit process, please put control+c", file=sys.stderr)
+stream.start()
+try:
+    for frame in stream:
+        # エンコードが追いつかないときはフレームを捨てて受信を続ける
+        recorder.submit(frame.image, block=False)
+except KeyboardInterrupt:
+    print("receive control+c\n")
+
+stream.stop()
+recorder.close()
+print(f"recorded: {recorder.frames}, dropped: {recorder.dropped + stream.dropped}, "
+      f"missed: {stream.missed}, files: {recorder.chunks}")
+print("Finish process")
@@ -0,0 +1,236 @@
+"""
+    保存した画像を撮影画像として再生するカメラ
+
+    TIS_CAMと同じメソッドを持ち，フォルダに保存した画像（takePic.pyで保存したJPEG，PNG，TIFF，npyなど）か，
+    frameArchive.pyで保存したファイル（.tisarc）のフレームを順番に返す．
+    カメラの無いPCで，保存・エンコード・HDR合成の処理を実際の解像度とフレームレートで動かすのに使う．
+
+    使い方:
+        Camera = tis.TIS_CAM(backend="replay", source="./image/")
+        Camera = tis.TIS_CAM(backend="replay", source="burst.tisarc", realtime=False)   # 待たずに次々返す
+        TIS_BACKEND=replay TIS_REPLAY=burst.tisarc python takePic.py                 # 環境変数で選ぶ
+
+    再生の速さ:
+        realtime=True:  fpsの間隔でフレームが届く（取りに来るのが遅ければ間のフレームは飛ばす）
+                        fpsを省略すると.tisarcは記録した時刻の間隔，フォルダは30fps
+        realtime=False: 待たずに次のフレームを返す（処理の限界の速さを測る）
+    loop=Falseなら最後のフレームの後はSnapImageがIC_ERRORを返す（finishedがTrueになる）．
+
+    SetFormatで保存したときと違う画素形式を選ぶと変換して返す（ベイヤー配列はdefine.BAYER_PATTERN）．
+    ExposureとGainは記録するだけで，画像の明るさは変わらない．
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+import tisgrabber as tis
+from define import *
+from debayer import debayer, load_raw
+from frameArchive import ArchiveReader, ARCHIVE_EXTENSION
+from simCam import SimCamera
+
+REPLAY_ENV = "TIS_REPLAY" # sourceを省略したときに再生するフォルダまたはファイル
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".npy")
+DEFAULT_FPS = 30.0
+
+# 画素形式 → (チャンネル数, 型)
+SINK_LAYOUTS = {tis.SinkFormats.Y800: (1, np.uint8),
+                tis.SinkFormats.RGB24: (3, np.uint8),
+                tis.SinkFormats.RGB32: (4, np.uint8),
+                tis.SinkFormats.Y16: (1, np.uint16)}
+
+
+def sink_format(img):
+    """画像の形と型から画素形式を決める
+    """
+    channels = 1 if img.ndim == 2 else img.shape[2]
+    for sink, layout in SINK_LAYOUTS.items():
+        if layout == (channels, img.dtype):
+            return sink
+    raise ValueError("unsupported image: %s %s" % (img.shape, img.dtype))
+
+
+def mosaic(bgr, pattern=BAYER_PATTERN):
+    """BGR画像をベイヤー配列の1チャンネル画像にする（debayerの逆）
+    """
+    channel = {"R": 2, "G": 1, "B": 0}
+    raw = np.empty(bgr.shape[:2] + (1,), dtype=bgr.dtype)
+    for i, c in enumerate(pattern):
+        y, x = divmod(i, 2)
+        raw[y::2, x::2, 0] = bgr[y::2, x::2, channel[c]]
+    return raw
+
+
+def convert(img, src, dst):
+    """画素形式srcの画像（上下反転前の向き）を画素形式dstにする
+    """
+    if img.ndim == 2:
+        img = img[:, :, np.newaxis]
+    if src == dst:
+        return img
+    # 一度8bitか16bitのBGRにしてから変換する
+    if src in (tis.SinkFormats.Y800, tis.SinkFormats.Y16):
+        bgr = debayer(img)
+    else:
+        bgr = img[:, :, :3]
+    if dst in (tis.SinkFormats.Y800, tis.SinkFormats.Y16):
+        raw = mosaic(bgr)
+        if dst == tis.SinkFormats.Y16 and raw.dtype == np.uint8:
+            return raw.astype(np.uint16) << 8
+        if dst == tis.SinkFormats.Y800 and raw.dtype == np.uint16:
+            return (raw >> 8).astype(np.uint8)
+        return raw
+    if bgr.dtype == np.uint16:
+        bgr = (bgr >> 8).astype(np.uint8)
+    if dst == tis.SinkFormats.RGB32:
+        return cv2.cvtColor(np.ascontiguousarray(bgr), cv2.COLOR_BGR2BGRA)
+    return bgr
+
+
+class FolderSource(object):
+    """フォルダの画像をファイル名順に読む
+    """
+    def __init__(self, folder, preload=False):
+        self.files = sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                            if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS)
+        if not self.files:
+            raise ValueError("no image in " + folder)
+        self._frames = [self._load(i) for i in range(len(self.files))] if preload else None
+        first = self[0]
+        self.shape = first.shape if first.ndim == 3 else first.shape + (1,)
+        self.format = sink_format(first)
+        self.fps = None
+
+    def __len__(self):
+        return len(self.files)
+
+    def _load(self, i):
+        img = load_raw(self.files[i])
+        if img is None:
+            raise ValueError("could not read " + self.files[i])
+        return img
+
+    def __getitem__(self, i):
+        return self._load(i) if self._frames is None else self._frames[i]
+
+    def close(self):
+        self._frames = None
+
+
+class ArchiveSource(object):
+    """frameArchive.pyのファイルのフレームを読む（コピーしないビュー）
+    """
+    def __init__(self, path):
+        self.archive = ArchiveReader(path)
+        if len(self.archive) == 0:
+            raise ValueError("no frame in " + path)
+        self.shape = self.archive.shape
+        self.format = tis.SinkFormats(int(self.archive.header["format"][0]))
+        # 記録した時刻の間隔の中央値から再生のフレームレートを決める
+        times = np.diff(self.archive.index["timestamp"][:len(self.archive)])
+        times = times[times > 0]
+        self.fps = 1/float(np.median(times)) if len(times) else None
+
+    def __len__(self):
+        return len(self.archive)
+
+    def __getitem__(self, i):
+        return self.archive[i]
+
+    def close(self):
+        self.archive.close()
+
+
+def open_source(source, preload=False):
+    """フォルダ，または.tisarcのファイルを開く
+    """
+    if os.path.isdir(source):
+        return FolderSource(source, preload)
+    if source.endswith(ARCHIVE_EXTENSION):
+        return ArchiveSource(source)
+    raise ValueError("replay source must be a folder or a %s file: %s" % (ARCHIVE_EXTENSION, source))
+
+
+class ReplayCamera(SimCamera):
+    """保存した画像を返すカメラ（TIS_CAM互換）
+    トリガーモード，プロパティ，コールバックなどはSimCameraと同じ
+    """
+    def __init__(self, source=None, fps=None, realtime=True, loop=True, preload=False,
+                 drop_rate=0.0, devices=None, seed=0):
+        """
+        Params:
+            source: 再生するフォルダ，または.tisarcのファイル（Noneなら環境変数TIS_REPLAY）
+            fps: 再生のフレームレート（Noneなら.tisarcは記録した間隔，フォルダはDEFAULT_FPS）
+            realtime: Falseなら待たずに次のフレームを返す
+            loop: Trueなら最後のフレームの次は最初に戻る
+            preload: Trueならフォルダの画像を最初に全て読んでおく（読み込みの時間を測らないとき）
+            drop_rate: フレームが落ちる確率
+            devices: 接続されていることにするデバイスの一意な名前（Noneならsourceの名前）
+            seed: 乱数の種
+        """
+        source = source or os.environ.get(REPLAY_ENV)
+        if not source:
+            raise ValueError("replay source is not given (source= or %s)" % REPLAY_ENV)
+        self.source = open_source(source, preload)
+        self.loop = loop
+        self.finished = False
+        if devices is None:
+            devices = ("Replay " + os.path.basename(os.path.normpath(source)),)
+        height, width, channels = self.source.shape
+        super().__init__(width, height, fps or self.source.fps or DEFAULT_FPS, noise=0.0,
+                         drop_rate=drop_rate, sink=self.source.format, devices=devices, seed=seed,
+                         realtime=realtime)
+
+    def _allocate(self):
+        channels, dtype = SINK_LAYOUTS[self.sink]
+        self._buffer = np.zeros((self.height, self.width, channels), dtype=dtype)
+
+    def _render(self, number):
+        """number枚目（ループするなら枚数で割った余り）の画像をDLLと同じ上下反転した向きで書き込む
+        """
+        img = convert(self.source[number % len(self.source)], self.source.format, self.sink)
+        np.copyto(self._buffer, img[::-1])
+
+    def _period(self):
+        # 露光時間ではなく記録したフレームレートで再生する
+        return 1.0/self.fps
+
+    def _wait_frame(self, timeout):
+        number = super()._wait_frame(timeout)
+        if number is not None and not self.loop and number >= len(self.source):
+            # 最後まで再生したら，フレームが届かないカメラと同じくタイムアウトまで待つ
+            self.finished = True
+            time.sleep(timeout)
+            return None
+        return number
+
+    def open(self, unique_device_name):
+        # 再生するので，どの名前でも開ける
+        self.device = unique_device_name
+        return tis.IC_SUCCESS
+
+    def openVideoCaptureDevice(self, DeviceName):
+        self.device = DeviceName
+        return tis.IC_SUCCESS
+
+    def GetVideoFormats(self):
+        return [("%s (%dx%d)" % (f, self.width, self.height)).encode("utf-8")
+                for f in ("RGB24", "RGB32", "Y800", "Y16")]
+
+    def SetVideoFormat(self, Format):
+        # 解像度は保存した画像のものしか選べない
+        if ("(%dx%d)" % (self.width, self.height)) not in Format:
+            return tis.IC_ERROR
+        return super().SetVideoFormat(Format)
+
+    def StartLive(self, showlive=1):
+        self.finished = False
+        return super().StartLive(showlive)
+
+    def close(self):
+        """再生するファイルを閉じる
+        """
+        self.StopLive()
+        self.source.close()
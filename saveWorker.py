@@ -0,0 +1,108 @@
+"""
+    画像の保存（エンコードと書き込み）を別スレッドで行う
+
+    撮影ループはsubmit()でフレームを渡すだけで次の撮影に進める．
+    キューが一杯のときはsubmit()が待つので，保存が追いつかない場合でも
+    メモリを使い切らない．close()でキューに残ったフレームを全て書き込む．
+    保存形式はencoders.pyのエンコーダで指定する（省略時はJPEG）．
+    metricsを渡すと，キューが空くまでの待ち（submit），キューでの待ち（queue），
+    エンコードと書き込み（save）の時間と，保存に失敗した数を記録する．
+"""
+import sys
+import queue
+import threading
+import time
+
+from encoders import JpegEncoder
+from metrics import NULL_METRICS
+
+
+class SaveWorker(object):
+    """画像のエンコードとファイル書き込みを行うスレッドプール
+    """
+    def __init__(self, workers=2, max_queue=4, on_saved=None, encoder=None, metrics=NULL_METRICS):
+        """
+        Params:
+            workers: 保存スレッドの数
+            max_queue: 保存待ちフレームの最大数（これを超えるとsubmitが待つ）
+            on_saved: 保存完了時に保存スレッドから呼ばれる関数 on_saved(fileName)
+            encoder: 保存形式（encoders.make_encoderで作ったもの．Noneならdefine.compressionRateのJPEG）
+            metrics: 処理時間の記録先（metrics.Metrics）
+        """
+        self.metrics = metrics
+        self.encoder = JpegEncoder() if encoder is None else encoder
+        self.on_saved = on_saved
+        self.saved = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(max_queue)
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._run, name="SaveWorker-%d" % i, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def submit(self, fileName, frame, release=None):
+        """保存するフレームをキューに入れる
+        frameは保存が終わるまで書き換えないこと
+        releaseを渡すと，保存が終わった後（失敗しても）release(frame)を呼ぶ（バッファプールへの返却など）
+        encoder.inlineがTrue（カメラの画像バッファを書く）なら，キューに入れずにこの場で保存する
+        """
+        if self.encoder.inline:
+            self._save(fileName, frame, release)
+        else:
+            with self.metrics.stage("submit"):
+                self._queue.put((fileName, frame, release, time.perf_counter()))
+
+    def _save(self, fileName, frame, release, queued=None):
+        if queued is not None:
+            self.metrics.observe("queue", time.perf_counter() - queued)
+        try:
+            with self.metrics.stage("save"):
+                ok = self.encoder.write(fileName, frame)
+        except Exception as ex:
+            # 保存スレッドが止まるとsubmit()とclose()が待ち続けるので，どの例外でも続ける
+            print("%s: %s" % (type(ex).__name__, ex), file=sys.stderr)
+            ok = False
+        finally:
+            if release is not None:
+                release(frame)
+        with self._lock:
+            if ok:
+                self.saved += 1
+            else:
+                self.failed += 1
+        if not ok:
+            self.metrics.drop("save")
+            print(fileName + " could not be saved", file=sys.stderr)
+        elif self.on_saved is not None:
+            try:
+                self.on_saved(fileName)
+            except Exception as ex:
+                print("on_saved failed: %s: %s" % (type(ex).__name__, ex), file=sys.stderr)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                self._save(*item)
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """キューに残ったフレームを全て保存してからスレッドを終了する
+        """
+        for t in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
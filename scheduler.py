@@ -0,0 +1,72 @@
+"""
+    一定間隔で撮影するためのスケジューラ
+
+    開始時刻から period ごとの時刻（time.monotonicの格子）で撮影タイミングを決めるので，
+    撮影・保存・表示に掛かった時間が積み重なって周期がずれていくことがない．
+    処理が1周期以上遅れたときは，間に合わなかった枠を飛ばしてmissedに数える．
+
+    使い方:
+        sched = IntervalScheduler(0.9)
+        while True:
+            tick = sched.wait()
+            frame = session.capture()
+"""
+import time
+from collections import namedtuple
+
+# index: 枠番号（開始時が0）, scheduled: 予定時刻(monotonic), actual: 実際の時刻(monotonic)
+# timestamp: 実際の時刻(time.time), jitter: 予定時刻からの遅れ[sec], missed: 直前に飛ばした枠の数
+Tick = namedtuple("Tick", ["index", "scheduled", "actual", "timestamp", "jitter", "missed"])
+
+
+class IntervalScheduler(object):
+    """monotonicクロックの格子上で撮影タイミングを出す
+    """
+    def __init__(self, period, start=None):
+        """
+        Params:
+            period: 撮影間隔[sec]
+            start: 最初の枠の時刻(time.monotonic)．Noneなら現在時刻
+        """
+        self.period = period
+        self.start = time.monotonic() if start is None else start
+        self.index = 0
+        self.count = 0
+        self.missed = 0
+        self.jitter_sum = 0.0
+        self.jitter_max = 0.0
+
+    def wait(self):
+        """次の枠の時刻まで待ってTickを返す
+        """
+        scheduled = self.start + self.index*self.period
+        now = time.monotonic()
+
+        # 1周期以上遅れていたら，過ぎてしまった枠を飛ばす
+        missed = 0
+        if now >= scheduled + self.period:
+            missed = int((now - scheduled)//self.period)
+            self.index += missed
+            self.missed += missed
+            scheduled = self.start + self.index*self.period
+
+        while now < scheduled:
+            time.sleep(scheduled - now)
+            now = time.monotonic()
+
+        jitter = now - scheduled
+        tick = Tick(self.index, scheduled, now, time.time(), jitter, missed)
+        self.index += 1
+        self.count += 1
+        self.jitter_sum += jitter
+        self.jitter_max = max(self.jitter_max, jitter)
+        return tick
+
+    def summary(self):
+        """これまでの撮影回数，飛ばした枠数，遅れの平均と最大[sec]を返す
+        """
+        mean = self.jitter_sum/self.count if self.count else 0.0
+        return {"count": self.count,
+                "missed": self.missed,
+                "jitter_mean": mean,
+                "jitter_max": self.jitter_max}
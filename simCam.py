@@ -0,0 +1,436 @@
+"""
+    カメラを使わずに撮影処理を動かすための模擬カメラ
+
+    TIS_CAMと同じメソッドを持ち，numpyで作った画像を返す．
+    カメラやドライバの無いLinuxやCIで，撮影処理の動作確認や性能測定に使う．
+
+    使い方:
+        Camera = tis.TIS_CAM(backend="sim")                  # 引数で選ぶ
+        Camera = tis.TIS_CAM(backend="sim", width=640, height=480, fps=60)
+        TIS_BACKEND=sim python takePic.py                    # 環境変数で選ぶ
+
+    模擬する内容:
+        解像度，画像フォーマット(Y800/RGB24/RGB32/Y16)とY16のビット深度，フレームレート，
+        Exposure/Gainに比例する明るさ，ショットノイズ，フレーム落ち，
+        トリガーモード（ソフトウェアトリガー，trigger()による外部トリガー入力）
+    Y800/Y16はRGGB配列のベイヤー画像になる．画像はDLLと同じく上下反転した向きで返す．
+"""
+import ctypes
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import cv2
+import numpy as np
+
+import tisgrabber as tis
+from define import *
+
+
+class SimCamera(object):
+    """numpyで画像を作る模擬カメラ（TIS_CAM互換）
+    """
+    def __init__(self, width=IMAGE_WIDTH, height=IMAGE_HEIGHT, fps=30.0, bits=12,
+                 noise=2.0, drop_rate=0.0, sink=tis.SinkFormats.RGB24,
+                 devices=("DFK 38UX304 00000001",), seed=0, realtime=True):
+        """
+        Params:
+            width, height: 画像サイズ
+            fps: フレームレート（露光時間が長いときは露光時間で決まる）
+            bits: Y16のときの有効ビット数（上位ビットに詰める）
+            noise: ノイズの標準偏差（8bit換算）
+            drop_rate: フレームが落ちる確率
+            sink: 画像フォーマット(SinkFormats)
+            devices: 接続されていることにするデバイスの一意な名前
+            seed: 乱数の種
+            realtime: Falseならフレームの間隔（fpsと露光時間）を待たずに次のフレームを返す（処理時間の測定用）
+        """
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.bits = bits
+        self.noise = noise
+        self.drop_rate = drop_rate
+        self.realtime = realtime
+        self.sink = sink
+        self.devices = list(devices)
+        self.device = None
+        self.live = False
+        self.continuous = 1
+        self.frame_number = -1
+        self._rng = np.random.default_rng(seed)
+        self._callback = None
+        self._callback_data = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._triggers = deque()
+        self._trigger_cond = threading.Condition()
+        self._arrival = 0.0 # 最後のフレームが届いた時刻
+        self._last = -1
+        self._scene = None
+        self._noise = None
+        self._bases = OrderedDict()
+        self._buffer = None
+        self._properties = {("Exposure", "Value"): 0.01,
+                            ("Exposure", "Auto"): 1,
+                            ("Gain", "Value"): 0,
+                            ("Gain", "Auto"): 1,
+                            ("Trigger", "Enable"): 0}
+        self._ranges = {("Exposure", "Value"): (1e-5, 30.0),
+                        ("Gain", "Value"): (0, 480)}
+        self._allocate()
+
+    # ------------------------------------------------------------------
+    # 画像の生成
+
+    def _allocate(self):
+        """フォーマットに合わせて画像バッファを作り直す
+        """
+        channels = {tis.SinkFormats.Y800: 1, tis.SinkFormats.RGB24: 3,
+                    tis.SinkFormats.RGB32: 4, tis.SinkFormats.Y16: 1}[self.sink]
+        dtype = np.uint16 if self.sink == tis.SinkFormats.Y16 else np.uint8
+        self._buffer = np.zeros((self.height, self.width, channels), dtype=dtype)
+        self._bases.clear()
+        self._noise = None
+        if self._scene is None or self._scene.shape[:2] != (self.height, self.width):
+            self._scene = self._make_scene()
+
+    def _make_scene(self):
+        """明るさの幅が広い模擬シーン（線形の放射輝度，上下反転済み）を作る
+        """
+        y, x = np.mgrid[0:self.height, 0:self.width].astype(np.float32)
+        x /= self.width
+        y /= self.height
+        scene = np.empty((self.height, self.width, 3), dtype=np.float32)
+        scene[..., 0] = 0.2 + 0.6*x
+        scene[..., 1] = 0.2 + 0.6*y
+        scene[..., 2] = 0.5 + 0.3*np.sin(12*x)*np.cos(9*y)
+        # 露光を変えないと白飛びする明るい領域
+        scene[(x - 0.75)**2 + (y - 0.3)**2 < 0.01] *= 8.0
+        return scene[::-1].copy()
+
+    def _scale(self):
+        return 65535.0 if self.sink == tis.SinkFormats.Y16 else 255.0
+
+    def _base(self):
+        """今のExposure/Gainでのノイズの無い画像（キャッシュする）
+        """
+        exposure = self._properties[("Exposure", "Value")]
+        gain = self._properties[("Gain", "Value")]
+        key = (exposure, gain)
+        if key in self._bases:
+            self._bases.move_to_end(key)
+            return self._bases[key]
+
+        scale = self._scale()
+        # Exposure 0.01秒，Gain 0で中間の明るさになる
+        img = self._scene*(exposure/0.01*10**(gain/20)*0.5*scale)
+        if self.sink in (tis.SinkFormats.Y800, tis.SinkFormats.Y16):
+            img = self._mosaic(img)
+        elif self.sink == tis.SinkFormats.RGB32:
+            img = np.concatenate([img, np.full(img.shape[:2] + (1,), scale, np.float32)], axis=2)
+        if self.sink == tis.SinkFormats.Y16:
+            step = 2**(16 - self.bits)
+            img = np.floor(np.clip(img, 0, scale)/step)*step
+        # ノイズを足すときに0付近で負にならないよう，ノイズの平均分だけ下げておく
+        img -= self._noise_offset()
+        base = np.clip(img, 0, scale).astype(self._buffer.dtype)
+        self._bases[key] = base
+        if len(self._bases) > 8:
+            self._bases.popitem(last=False)
+        return base
+
+    def _mosaic(self, img):
+        """RGB(BGR順)をRGGB配列のベイヤー画像にする（上下反転した向きのまま）
+        """
+        upright = img[::-1]
+        raw = np.empty(upright.shape[:2], dtype=np.float32)
+        raw[0::2, 0::2] = upright[0::2, 0::2, 2]
+        raw[0::2, 1::2] = upright[0::2, 1::2, 1]
+        raw[1::2, 0::2] = upright[1::2, 0::2, 1]
+        raw[1::2, 1::2] = upright[1::2, 1::2, 0]
+        return raw[::-1, :, np.newaxis]
+
+    def _noise_offset(self):
+        return 4*self.noise*self._scale()/255.0
+
+    def _noise_frames(self):
+        """使い回すノイズ画像を数枚用意する（毎フレーム乱数を作ると遅いため）
+        """
+        if self._noise is None:
+            scale = self._scale()
+            sigma = self.noise*scale/255.0
+            self._noise = [np.clip(self._rng.normal(self._noise_offset(), sigma, self._buffer.shape),
+                                   0, scale).astype(self._buffer.dtype) for i in range(4)]
+        return self._noise
+
+    def _render(self, number):
+        """フレーム番号numberの画像をバッファに書き込む
+        """
+        base = self._base()
+        if self.noise > 0:
+            noise = self._noise_frames()
+            cv2.add(base, noise[number % len(noise)], dst=self._buffer)
+        else:
+            np.copyto(self._buffer, base)
+
+    # ------------------------------------------------------------------
+    # フレームのタイミング
+
+    def _period(self):
+        return max(1.0/self.fps, self._properties[("Exposure", "Value")])
+
+    def _wait_frame(self, timeout):
+        """次のフレームが届くまで待ち，そのフレーム番号を返す（タイムアウトならNone）
+        """
+        if self._properties[("Trigger", "Enable")]:
+            return self._wait_trigger(timeout)
+        if not self.realtime:
+            while True:
+                self._last += 1
+                if self.drop_rate > 0 and self._rng.random() < self.drop_rate:
+                    continue
+                return self._last
+        deadline = time.monotonic() + timeout
+        while True:
+            # 最後に届いたフレームから今の間隔で次が届く（露光時間が変わっても番号の掛け算で先へ飛ばない）
+            period = self._period()
+            now = time.monotonic()
+            skip = max(int((now - self._arrival)/period), 0) + 1
+            arrival = self._arrival + skip*period
+            if arrival > deadline:
+                return None
+            if arrival > now:
+                time.sleep(arrival - now)
+            self._arrival = arrival
+            self._last += skip
+            number = self._last
+            if self.drop_rate > 0 and self._rng.random() < self.drop_rate:
+                continue
+            return number
+
+    def _wait_trigger(self, timeout):
+        """トリガーモードで次のトリガーを待ち，露光が終わったフレームの番号を返す（タイムアウトならNone）
+        """
+        with self._trigger_cond:
+            if not self._trigger_cond.wait_for(lambda: self._triggers, timeout):
+                return None
+            fired = self._triggers.popleft()
+        done = fired + self._properties[("Exposure", "Value")]
+        now = time.monotonic()
+        if done > now:
+            time.sleep(done - now)
+        self._last += 1
+        return self._last
+
+    def trigger(self):
+        """トリガー入力を1回送る（ハードウェアトリガーの模擬）．トリガーモードでライブ中のみ有効
+        """
+        if self.live and self._properties[("Trigger", "Enable")]:
+            with self._trigger_cond:
+                self._triggers.append(time.monotonic())
+                self._trigger_cond.notify()
+
+    def _run_callback(self):
+        """連続モードでフレームが届くたびにコールバックを呼ぶ
+        """
+        ptr = ctypes.cast(self._buffer.ctypes.data, ctypes.POINTER(ctypes.c_ubyte))
+        while self.live:
+            number = self._wait_frame(0.1)
+            if number is None or not self.live:
+                continue
+            with self._lock:
+                self._render(number)
+                self.frame_number = number
+            self._callback(0, ptr, number, self._callback_data)
+
+    # ------------------------------------------------------------------
+    # デバイス
+
+    def GetDevices(self):
+        return [d.encode("utf-8") for d in self.devices]
+
+    def open(self, unique_device_name):
+        if unique_device_name in self.devices:
+            self.device = unique_device_name
+            return tis.IC_SUCCESS
+        return tis.IC_ERROR
+
+    def openVideoCaptureDevice(self, DeviceName):
+        for d in self.devices:
+            if d == DeviceName or d.startswith(DeviceName + " "):
+                self.device = d
+                return tis.IC_SUCCESS
+        return tis.IC_ERROR
+
+    def IsDevValid(self):
+        return 1 if self.device is not None else 0
+
+    def ShowDeviceSelectionDialog(self):
+        if self.device is None and self.devices:
+            self.device = self.devices[0]
+
+    def ShowPropertyDialog(self):
+        pass
+
+    def SaveDeviceStateToFile(self, FileName):
+        return tis.IC_SUCCESS
+
+    def LoadDeviceStateFromFile(self, FileName):
+        pass
+
+    # ------------------------------------------------------------------
+    # フォーマット
+
+    def GetVideoFormats(self):
+        return [("%s (%dx%d)" % (f, self.width, self.height)).encode("utf-8")
+                for f in ("RGB24", "RGB32", "Y800", "Y16")]
+
+    def SetVideoFormat(self, Format):
+        m = re.match(r"\s*(\w+)\s*\((\d+)x(\d+)\)", Format)
+        if m is None or self.live:
+            return tis.IC_ERROR
+        self.width, self.height = int(m.group(2)), int(m.group(3))
+        if m.group(1) in tis.SinkFormats.__members__:
+            self.sink = tis.SinkFormats[m.group(1)]
+        self._allocate()
+        return tis.IC_SUCCESS
+
+    def SetFrameRate(self, FPS):
+        self.fps = FPS
+        return tis.IC_SUCCESS
+
+    def get_video_format_width(self):
+        return self.width
+
+    def get_video_format_height(self):
+        return self.height
+
+    def SetFormat(self, Format):
+        if Format != self.sink:
+            self.sink = Format
+            self._allocate()
+
+    def GetFormat(self):
+        return self.sink
+
+    # ------------------------------------------------------------------
+    # ライブ映像と画像の取得
+
+    def StartLive(self, showlive=1):
+        if self.device is None:
+            return tis.IC_ERROR
+        if self.live:
+            return tis.IC_SUCCESS
+        self.live = True
+        self._arrival = time.monotonic()
+        self._last = -1
+        self._triggers.clear()
+        if self._callback is not None and self.continuous == 0:
+            self._thread = threading.Thread(target=self._run_callback, daemon=True)
+            self._thread.start()
+        return tis.IC_SUCCESS
+
+    def StopLive(self):
+        self.live = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return tis.IC_SUCCESS
+
+    def SnapImage(self, timeout=2000):
+        if not self.live:
+            return tis.IC_NOT_IN_LIVEMODE
+        number = self._wait_frame(timeout/1000.0)
+        if number is None:
+            return tis.IC_ERROR
+        with self._lock:
+            self._render(number)
+            self.frame_number = number
+        return tis.IC_SUCCESS
+
+    def GetImageDescription(self):
+        bits = self._buffer.shape[2]*self._buffer.itemsize*8
+        return (self.width, self.height, bits, self.sink.value)
+
+    def GetImagePtr(self):
+        return self._buffer.ctypes.data
+
+    def GetImage(self):
+        return self._buffer.view(np.uint8).reshape(self.height, self.width, -1)
+
+    def GetImageEx(self):
+        return self._buffer
+
+    def GetImageInto(self, out):
+        if out.nbytes != self._buffer.nbytes or not out.flags.c_contiguous:
+            raise ValueError("out must be a contiguous array of %d bytes" % self._buffer.nbytes)
+        ctypes.memmove(out.ctypes.data, self._buffer.ctypes.data, self._buffer.nbytes)
+        return out
+
+    def SaveImage(self, FileName, FileType, Quality=75):
+        img = self.GetImageEx()[::-1]
+        if FileType == "JPEG":
+            ok = cv2.imwrite(FileName, img, [cv2.IMWRITE_JPEG_QUALITY, Quality])
+        else:
+            ok = cv2.imwrite(FileName, img)
+        return tis.IC_SUCCESS if ok else tis.IC_ERROR
+
+    def SetFrameReadyCallback(self, CallbackFunction, data):
+        self._callback = CallbackFunction
+        self._callback_data = data
+        return tis.IC_SUCCESS
+
+    def SetContinuousMode(self, Mode):
+        self.continuous = Mode
+        return tis.IC_SUCCESS
+
+    # ------------------------------------------------------------------
+    # プロパティ
+
+    def _set(self, Property, Element, Value):
+        if (Property, Element) not in self._properties:
+            return tis.IC_PROPERTY_ELEMENT_NOT_AVAILABLE
+        self._properties[(Property, Element)] = Value
+        return tis.IC_SUCCESS
+
+    def PropertyAvailable(self, Property):
+        return 1 if any(p == Property for p, e in self._properties) else 0
+
+    def SetPropertyValue(self, Property, Element, Value):
+        return self._set(Property, Element, Value)
+
+    def GetPropertyValue(self, Property, Element):
+        return int(self._properties.get((Property, Element), 0))
+
+    def SetPropertyAbsoluteValue(self, Property, Element, Value):
+        return self._set(Property, Element, float(Value))
+
+    def GetPropertyAbsoluteValue(self, Property, Element, Value):
+        Value[0] = float(self._properties.get((Property, Element), 0))
+        return tis.IC_SUCCESS
+
+    def GetPropertyValueRange(self, Property, Element):
+        return self._ranges.get((Property, Element))
+
+    def GetPropertyAbsoluteValueRange(self, Property, Element):
+        return self._ranges.get((Property, Element))
+
+    def SetPropertySwitch(self, Property, Element, Value):
+        return self._set(Property, Element, Value)
+
+    def GetPropertySwitch(self, Property, Element, Value):
+        Value[0] = int(self._properties.get((Property, Element), 0))
+        return tis.IC_SUCCESS
+
+    def PropertyOnePush(self, Property, Element):
+        if (Property, Element) == ("Trigger", "Software Trigger"):
+            self.trigger()
+        return tis.IC_SUCCESS
+
+    def EnableTrigger(self, Enable):
+        return self._set("Trigger", "Enable", int(Enable))
+
+    def SoftwareTrigger(self):
+        return self.PropertyOnePush("Trigger", "Software Trigger")
@@ -0,0 +1,346 @@
+"""
+    複数枚撮影の合成（スタッキング）
+
+    どの方式もフレームを1枚ずつ受け取りながら処理するので，
+    N枚全てをメモリに持つ必要はない．共通のインターフェース:
+        stacker.reset(shape, ave, dtype)  合成を始める（dtypeはuint8またはY16のuint16）
+        stacker.add(img)           画像を1枚加える（imgはコピーせずに読むだけ）
+        stacker.result(out=None)   合成結果を上下反転した，入力と同じ型の配列で返す
+                                   （outを渡すとそこに書き込む．省略時は新しい配列）
+
+    方式:
+        mean:   平均（Averager）
+        median: 中央値（MedianStacker，exact枚までは正確な中央値，それ以上はwindow枚ずつの中央値をさらに中央値で合成）
+        sigma:  シグマクリップ平均（SigmaClipStacker）
+        min:    最小値（MinStacker）
+        max:    最大値（MaxStacker）
+"""
+import numpy as np
+
+
+def sum_dtype(dtype, ave):
+    """dtypeの画像をave枚足しても溢れない整数型を返す
+    """
+    peak = int(np.iinfo(dtype).max)*ave
+    for t in (np.uint16, np.uint32):
+        if peak <= np.iinfo(t).max:
+            return t
+    return np.uint64
+
+class Averager(object):
+    """複数枚の画像を整数のまま足し合わせて平均する
+
+    加算用のバッファは使い回し，割り算は最後に1回だけ行う．
+    上下反転は割り算の結果を書き込むときに一緒に行う．
+    """
+    def __init__(self):
+        self._acc = None
+        self._count = 0
+        self._dtype = np.uint8
+
+    def reset(self, shape, ave, dtype=np.uint8):
+        """加算を始める
+        Params:
+            shape: 画像の形 (height, width, channels)
+            ave: 足し合わせる枚数
+            dtype: 画像の型
+        """
+        # uint8は257枚までならuint16で溢れずに足せる
+        acc_dtype = sum_dtype(dtype, ave)
+        if self._acc is None or self._acc.shape != shape or self._acc.dtype != acc_dtype:
+            self._acc = np.empty(shape, dtype=acc_dtype)
+        self._acc.fill(0)
+        self._count = 0
+        self._dtype = dtype
+
+    def add(self, img):
+        """画像を1枚足す（imgはコピーせずに読むだけ）
+        """
+        np.add(self._acc, img, out=self._acc)
+        self._count += 1
+
+    def result(self, out=None):
+        """平均画像を上下反転して返す
+        """
+        img = np.empty(self._acc.shape, dtype=self._dtype) if out is None else out
+        np.floor_divide(self._acc[::-1], max(self._count, 1), out=img, casting="unsafe")
+        return img
+
+
+def median_of(stack):
+    """フレームの束 (n, height, width, channels) の画素ごとの中央値を返す
+    nが偶数のときは中央の2つの平均（四捨五入）
+    """
+    n = len(stack)
+    lo, hi = (n - 1)//2, n//2
+    part = np.partition(stack, [lo, hi] if lo != hi else lo, axis=0)
+    if lo == hi:
+        return part[lo].copy()
+    mid = part[lo].astype(np.uint16 if stack.dtype == np.uint8 else np.uint32)
+    mid += part[hi]
+    mid += 1
+    mid //= 2
+    return mid.astype(stack.dtype)
+
+
+def weighted_median_of(stack, weights, rows=256):
+    """フレームの束 (n, height, width, channels) の画素ごとの重み付き中央値を返す
+    weights[i]はi枚目が代表するフレーム数．重みが全て1ならmedian_ofと同じ値になる
+    （並べ替えの作業領域を抑えるためrows行ずつ処理する）
+    """
+    weights = np.asarray(weights, dtype=np.int64)
+    total = int(weights.sum())
+    out = np.empty(stack.shape[1:], dtype=stack.dtype)
+    for y in range(0, stack.shape[1], rows):
+        part = stack[:, y:y + rows]
+        order = np.argsort(part, axis=0, kind="stable")
+        values = np.take_along_axis(part, order, axis=0)
+        cum = np.cumsum(weights[order], axis=0)
+        # 累積の重みが半分に達する値と半分を超える値の平均（総数が奇数なら同じ値）
+        lo = np.take_along_axis(values, np.argmax(2*cum >= total, axis=0)[np.newaxis], axis=0)[0]
+        hi = np.take_along_axis(values, np.argmax(2*cum > total, axis=0)[np.newaxis], axis=0)[0]
+        mid = lo.astype(np.uint32)
+        mid += hi
+        mid += 1
+        mid //= 2
+        out[y:y + rows] = mid
+    return out
+
+
+class MedianStacker(object):
+    """中央値の合成
+
+    ave <= exactなら全フレームを1段にためて正確な中央値を取る（メモリはave枚分）．
+    それより多いときはremedianにする：window枚たまるごとに中央値を取り，その結果を1つ上の段にためる．
+    メモリはexact枚＋window枚×段数で済む．最後に途中までたまった段をまとめるときは，
+    各値が代表するフレーム数で重み付けした中央値を取るので，端数の1枚が段の中央値と同じ重みにならない．
+    """
+    def __init__(self, window=5, exact=32):
+        """
+        Params:
+            window: remedianの1段の枚数
+            exact: 正確な中央値を取る最大の枚数
+        """
+        self.window = window
+        self.exact = exact
+        self._levels = []
+        self._counts = []
+
+    def reset(self, shape, ave, dtype=np.uint8):
+        self._shape = shape
+        self._dtype = dtype
+        # 1段目はexact枚までならave枚，それより多ければexact枚ためてから中央値にする
+        first = min(max(ave, 1), self.exact)
+        # 必要な段数だけバッファを用意する（形が同じなら使い回す）
+        sizes = [first]
+        n = -(-ave//first)
+        while n > 1:
+            sizes.append(self.window)
+            n = -(-n//self.window)
+        if self._levels and (self._levels[0].shape[1:] != shape or self._levels[0].dtype != dtype):
+            self._levels = []
+        levels = []
+        for i, size in enumerate(sizes):
+            if i < len(self._levels) and len(self._levels[i]) == size:
+                levels.append(self._levels[i])
+            else:
+                levels.append(np.empty((size,) + shape, dtype=dtype))
+        self._levels = levels
+        self._counts = [0]*len(sizes)
+
+    def _weight(self, level):
+        """level段目の1つの値が代表するフレーム数
+        """
+        return len(self._levels[0])*self.window**(level - 1) if level > 0 else 1
+
+    def _push(self, level, img):
+        if level == len(self._levels):
+            self._levels.append(np.empty((self.window,) + self._shape, dtype=self._dtype))
+            self._counts.append(0)
+        self._levels[level][self._counts[level]] = img
+        self._counts[level] += 1
+        if self._counts[level] == len(self._levels[level]):
+            self._counts[level] = 0
+            self._push(level + 1, median_of(self._levels[level]))
+
+    def add(self, img):
+        self._push(0, img)
+
+    def result(self, out=None):
+        # 途中までたまった段の値を，代表するフレーム数で重み付けしてまとめる
+        filled = [(level, n) for level, n in enumerate(self._counts) if n > 0]
+        if len(filled) == 1:
+            level, n = filled[0]
+            carry = median_of(self._levels[level][:n])
+        else:
+            carry = weighted_median_of(np.concatenate([self._levels[level][:n] for level, n in filled]),
+                                       [self._weight(level) for level, n in filled for i in range(n)])
+        if out is None:
+            return carry[::-1].copy()
+        np.copyto(out, carry[::-1])
+        return out
+
+
+class SigmaClipStacker(object):
+    """シグマクリップ平均
+
+    それまでに採用した値の平均と標準偏差から sigma 倍以上外れた画素を捨てて平均する．
+    最初のSEED枚は中央値と中央絶対偏差（外れ値に強い基準）から外れた画素を捨て，
+    残りを平均と標準偏差の初期値にする．ホットピクセルや一瞬の反射を取り除ける．
+    SEED枚より少ないときは外れ値を判定できないので全て平均する．
+    """
+    SEED = 3
+
+    def __init__(self, sigma=3.0, min_std=1.0):
+        """
+        Params:
+            sigma: 何σ外れたら捨てるか
+            min_std: 標準偏差の下限（ノイズの無い画素で全て捨てないため）
+        """
+        self.sigma = sigma
+        self.min_std = min_std
+        self._sum = None
+
+    def reset(self, shape, ave, dtype=np.uint8):
+        self._dtype = dtype
+        # 1枚分の2乗はuint8ならuint16，uint16ならuint32に収まる
+        self._sq_dtype = np.uint16 if dtype == np.uint8 else np.uint32
+        sq_dtype = sum_dtype(self._sq_dtype, ave)
+        if (self._sum is None or self._sum.shape != shape or self._sum.dtype != sum_dtype(dtype, ave)
+                or self._sq.dtype != sq_dtype):
+            self._sum = np.empty(shape, dtype=sum_dtype(dtype, ave))
+            self._sq = np.empty(shape, dtype=sq_dtype)
+            self._cnt = np.empty(shape, dtype=np.uint16 if ave < 65536 else np.uint32)
+            self._seed = np.empty((self.SEED,) + shape, dtype=dtype)
+        self._sum.fill(0)
+        self._sq.fill(0)
+        self._cnt.fill(0)
+        self._seen = 0
+
+    def _accept(self, img, where=True):
+        np.add(self._sum, img, out=self._sum, where=where)
+        np.add(self._sq, np.square(img, dtype=self._sq_dtype), out=self._sq, where=where)
+        np.add(self._cnt, 1, out=self._cnt, where=where, casting="unsafe")
+
+    def _flush_seed(self, n):
+        """ためておいた最初のn枚を足す（SEED枚そろっていれば外れ値を捨てる）
+        """
+        seed = self._seed[:n]
+        if n < self.SEED:
+            for img in seed:
+                self._accept(img)
+            return
+        median = median_of(seed).astype(np.float32)
+        dev = np.abs(seed - median, dtype=np.float32)
+        # 中央絶対偏差を正規分布の標準偏差に換算する
+        std = np.median(dev, axis=0)*1.4826
+        np.maximum(std, self.min_std, out=std)
+        std *= self.sigma
+        for img, d in zip(seed, dev):
+            self._accept(img, d <= std)
+
+    def add(self, img):
+        if self._seen < self.SEED:
+            self._seed[self._seen] = img
+            self._seen += 1
+            if self._seen == self.SEED:
+                self._flush_seed(self.SEED)
+            return
+        cnt = self._cnt.astype(np.float32)
+        mean = np.divide(self._sum, cnt, dtype=np.float32)
+        var = np.divide(self._sq, cnt, dtype=np.float32)
+        var -= np.square(mean)
+        np.maximum(var, self.min_std**2, out=var)
+        var *= self.sigma**2
+        mean -= img
+        np.square(mean, out=mean)
+        where = mean <= var
+        self._accept(img, where)
+        self._seen += 1
+
+    def result(self, out=None):
+        if self._seen < self.SEED:
+            self._flush_seed(self._seen)
+            self._seen = self.SEED
+        img = np.empty(self._sum.shape, dtype=self._dtype) if out is None else out
+        np.floor_divide(self._sum[::-1], np.maximum(self._cnt[::-1], 1), out=img, casting="unsafe")
+        return img
+
+
+class MinStacker(object):
+    """画素ごとの最小値
+    """
+    _func = np.minimum
+
+    def __init__(self):
+        self._acc = None
+
+    def reset(self, shape, ave, dtype=np.uint8):
+        if self._acc is None or self._acc.shape != shape or self._acc.dtype != dtype:
+            self._acc = np.empty(shape, dtype=dtype)
+        self._first = True
+
+    def add(self, img):
+        if self._first:
+            np.copyto(self._acc, img)
+            self._first = False
+        else:
+            self._func(self._acc, img, out=self._acc)
+
+    def result(self, out=None):
+        if out is None:
+            return self._acc[::-1].copy()
+        np.copyto(out, self._acc[::-1])
+        return out
+
+
+class MaxStacker(MinStacker):
+    """画素ごとの最大値
+    """
+    _func = np.maximum
+
+
+# capture(stack=...)で指定できる合成方式
+STACK_MODES = {"mean": Averager,
+               "median": MedianStacker,
+               "sigma": SigmaClipStacker,
+               "min": MinStacker,
+               "max": MaxStacker}
+
+
+def make_stacker(mode):
+    """方式名から合成用のインスタンスを作る
+    """
+    if mode not in STACK_MODES:
+        raise ValueError("unknown stack mode: %s (%s)" % (mode, ", ".join(STACK_MODES)))
+    return STACK_MODES[mode]()
+
+
+if __name__ == "__main__":
+    # 合成結果の確認: python stacking.py
+    rng = np.random.default_rng(0)
+    shape = (6, 8, 3)
+    for dtype in (np.uint8, np.uint16):
+        high = int(np.iinfo(dtype).max) + 1
+        # 中央値はave枚（1〜26）の正確な中央値と一致する（偶数枚は中央の2つの平均の四捨五入）
+        for ave in range(1, 27):
+            frames = rng.integers(0, high, (ave,) + shape).astype(dtype)
+            stacker = MedianStacker()
+            stacker.reset(shape, ave, dtype)
+            for img in frames:
+                stacker.add(img)
+            expected = np.floor(np.median(frames.astype(np.float64), axis=0) + 0.5).astype(dtype)
+            assert np.array_equal(stacker.result(), expected[::-1]), ("median", dtype, ave)
+    # remedianとシグマクリップは1枚だけのホットピクセルを取り除く（どのフレームにあっても）
+    for name, stacker, counts in (("remedian", MedianStacker(window=5, exact=4), range(5, 41)),
+                                  ("sigma", SigmaClipStacker(), range(3, 17))):
+        for ave in counts:
+            for hot in (0, 1, 2, ave - 1):
+                stacker.reset(shape, ave)
+                for i in range(ave):
+                    img = np.full(shape, 100, np.uint8)
+                    if i == hot:
+                        img[0, 0, 0] = 255
+                    stacker.add(img)
+                assert stacker.result()[-1, 0, 0] == 100, (name, ave, hot)
+    print("ok")
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import beep
+
+from define import *
+from encoders import make_encoder
+from multiCam import CameraRig, list_devices
+from scheduler import IntervalScheduler
+
+
+# 変数設定
+DEVICE_NAMES = None # 使うカメラの一意な名前のリスト（Noneなら接続されている全カメラ）
+FOLDER_NAME = "./multi_test/" # 保存先ディレクトリ（カメラごとにサブフォルダを作る）
+FILE_NAME = "multi_test_" # ファイル名（共通）
+ENCODER = "jpeg" # 保存形式（encoders.pyのENCODERSのキー）
+ENCODER_OPTIONS = {"quality": compressionRate}
+SLEEP_SEC = 0.9 # 撮影間隔[sec]（撮影開始時刻の間隔）
+TIMING_FILE = "timing.csv" # 撮影時刻の記録（保存先ディレクトリに作成）
+SAVE_WORKERS = 4 # 保存スレッドの数（全カメラ共通）
+SAVE_QUEUE = 8 # 保存待ちフレームの最大数（全カメラ共通）
+
+names = DEVICE_NAMES or list_devices()
+if not names:
+    print("no detect device")
+    sys.exit()
+print("cameras: " + ", ".join(names))
+
+counter = int(input("Please input first file no: "))
+print("When you quit process, please put control+c", file=sys.stderr)
+
+os.makedirs(FOLDER_NAME, exist_ok=True)
+
+# 画像保存が完了したら表示する
+def on_saved(fileName):
+    print(fileName + " was saved", file=sys.stderr)
+
+rig = CameraRig(names, save_workers=SAVE_WORKERS, save_queue=SAVE_QUEUE, on_saved=on_saved,
+                encoder=make_encoder(ENCODER, **ENCODER_OPTIONS))
+
+timing_path = FOLDER_NAME + TIMING_FILE
+new_timing = not os.path.exists(timing_path)
+timing_log = open(timing_path, "a", encoding="utf-8")
+if new_timing:
+    timing_log.write("number,round,timestamp,cameras\n")
+
+scheduler = IntervalScheduler(SLEEP_SEC)
+try:
+    while True:
+        tick = scheduler.wait()
+        if tick.missed > 0:
+            print(f"{tick.missed} slot(s) missed", file=sys.stderr)
+        # 全カメラで同時に撮影し，共通の時刻を記録する
+        shot = rig.capture()
+        rig.save(shot, FOLDER_NAME, FILE_NAME, counter)
+        timing_log.write(f"{counter},{shot.round},{shot.timestamp:.6f},{len(shot.frames)}\n")
+        # 撮影したらビープ音を鳴らす
+        beep.beepOn(1500, 100)
+        counter += 1
+except KeyboardInterrupt:
+    print("receive control+c\n")
+
+# 保存待ちのフレームを全て書き込む
+rig.close()
+timing_log.close()
+print("Finish process")
@@ -1,24 +1,31 @@
 import os
-# opencvをインポートする前にこの処理を加えると起動が早くなる
-os.environ["OPENCV_VIDEOIO_MSMF_ENABLE_HW_TRANSFORMS"] = "0"
-import cv2
 import time
+# 起動時間の計測開始
+START_TIME = time.perf_counter()
 import beep
 import sys
 
-# dfk module
-import ctypes
-import cv2
+# dfk module（DLLは最初にカメラを使うときに読み込まれる）
 import tisgrabber as tis
 
 from define import *
 from easyCap import *
+from saveWorker import SaveWorker
+from scheduler import IntervalScheduler
+from hdrPipeline import HDRPipeline
+from framePool import FramePool
+from encoders import make_encoder
+from frameArchive import ArchiveWriter, ARCHIVE_EXTENSION
+from profiles import ProfileSwitcher, load_profile
+from preview import Preview
+from metrics import Metrics, MetricsExporter, NULL_METRICS
 
 #Create the camera object
 Camera = tis.TIS_CAM()
 
 #Set Property
-Camera.openVideoCaptureDevice("DFK 38UX304")
+DEVICE_NAME = "DFK 38UX304"
+Camera.openVideoCaptureDevice(DEVICE_NAME)
 
 #デバイスが見つからなかったら処理を終える
 if Camera.IsDevValid() != 1:
@@ -33,12 +40,38 @@ if Camera.IsDevValid() != 1:
 # 変数設定
 FOLDER_NAME = "./top_test_0407あ/" # 保存先ディレクトリ
 FILE_NAME = "top_test_" # ファイル名（共通）
-EXTENSION = ".jpg"
-SLEEP_SEC = 0.9 # 撮影間隔[sec]
+ENCODER = "jpeg" # 保存形式（"jpeg", "png", "tiff", "npy", "native"．nativeはaverage=1のときだけ使える）
+ENCODER_OPTIONS = {"quality": compressionRate} # 保存形式ごとの設定（encoders.pyの各クラスの引数）
+SLEEP_SEC = 0.9 # 撮影間隔[sec]（撮影開始時刻の間隔）
+TIMING_FILE = "timing.csv" # 撮影時刻の記録（保存先ディレクトリに作成）
+SAVE_WORKERS = 2 # 保存スレッドの数
+SAVE_QUEUE = 4 # 保存待ちフレームの最大数
 SHOW_WIN_SCALE = 0.25 # 表示ウィンドウの倍率
+PREVIEW_METHOD = "stride" # 表示用の縮小方法（"stride": 間引き，"area": 平均）
+HEADLESS = False # Trueにすると表示ウィンドウを出さない
+BEEP = True # Falseにすると保存完了のビープ音を鳴らさない（音の出ない環境で動かすときなど）
+STARTUP_BUDGET_SEC = 3.0 # 起動から入力待ちまでの目標時間[sec]（超えたら警告を出す）
+HDR = False # Trueにすると露光時間を変えて撮影し，HDR合成した.hdrと確認用の.jpgを保存する
+BRACKET = 3 # HDR撮影の露光倍率テーブル（3: 0.5〜2倍，5: 0.25〜4倍）
+SINK_FORMAT = "RGB24" # 取り込む画素形式（"Y800", "Y16"にするとベイヤー配列のまま撮影・保存する）
+RAW_ENCODER = "tiff" # Y800/Y16で撮影したときの保存形式（可逆で16bitを保存できる形式．debayer.pyでカラーにする）
+RAW_ENCODER_OPTIONS = {} # 無圧縮（PNGは圧縮に1枚1秒以上掛かる）
+ARCHIVE = False # Trueにすると1枚ずつファイルを作らず，1つのファイルに無圧縮で追記する（frameArchive.pyで書き出す）
+ARCHIVE_CAPACITY = 1000 # 1つのファイルに保存する最大枚数（最初にこの枚数分の領域を確保する）
+PROFILE = None # 起動時に適用するプロファイル名（profiles.pyで保存したもの．Noneなら使わない）
+PROFILE_KEYS = {} # 撮影中に表示ウィンドウでキーを押して切り替えるプロファイル（例: {"1": "preview", "2": "capture"}）
+METRICS_FILE = "metrics.jsonl" # 段階ごとの処理時間の記録（保存先ディレクトリに作成．.csvも可．Noneなら書き出さない）
+METRICS_PERIOD_SEC = 10 # 処理時間を書き出す間隔[sec]
+METRICS_PORT = None # Prometheus形式で処理時間を返すポート番号（例: 9108．Noneなら起動しない）
 
 counter = 0 # ファイル名（番号）
 
+# 起動時間の確認
+startup_sec = time.perf_counter() - START_TIME
+print(f"startup: {startup_sec:.2f} sec", file=sys.stderr)
+if startup_sec > STARTUP_BUDGET_SEC:
+    print(f"startup took longer than {STARTUP_BUDGET_SEC} sec", file=sys.stderr)
+
 # 初期設定画面
 print(f"you'll takePic {FOLDER_NAME}{FILE_NAME}")
 counter = int(input("Please input first file no: "))
@@ -46,40 +79,161 @@ cmd = input("Are you sure start process? (y/n): ")
 print("\n")
 print("When you quit process, please put control+c", file=sys.stderr)
 
-cv2.namedWindow("camera", cv2.WINDOW_NORMAL)
+# 段階ごとの処理時間（撮影，保存，表示，待ち時間）を計る
+metrics = Metrics() if METRICS_FILE is not None or METRICS_PORT is not None else NULL_METRICS
+
+# 表示は別スレッドで縮小して行う（撮影ループは表示を待たない）
+preview = Preview("camera", SHOW_WIN_SCALE, PREVIEW_METHOD, HEADLESS, metrics=metrics)
+# 音の鳴らし方は起動時に決めておく（保存スレッドで初めて鳴らすときに失敗しないように）
+beep.set_backend(None if BEEP else "null")
 
 # フォルダがなかったら作成
 os.makedirs(FOLDER_NAME, exist_ok=True)
+exporter = None
+if metrics is not NULL_METRICS:
+    exporter = MetricsExporter(metrics, None if METRICS_FILE is None else FOLDER_NAME + METRICS_FILE,
+                               METRICS_PERIOD_SEC, METRICS_PORT)
+
+# プロファイルは起動時にまとめて読んでおく（画素形式はプロファイルの指定を優先する）
+profiles = {name: load_profile(name) for name in set(PROFILE_KEYS.values()) | ({PROFILE} - {None})}
+if PROFILE is not None and profiles[PROFILE].sink is not None:
+    SINK_FORMAT = profiles[PROFILE].sink
+
+# 画素形式はライブ映像の開始前に設定する
+Camera.SetFormat(tis.SinkFormats[SINK_FORMAT])
+
+def make_output_encoder():
+    """今の画素形式で使う保存形式のエンコーダを作る（Y800/Y16ならRAW_ENCODER）
+    """
+    if Camera.GetFormat() in (tis.SinkFormats.Y800, tis.SinkFormats.Y16):
+        name, options = RAW_ENCODER, RAW_ENCODER_OPTIONS
+    else:
+        name, options = ENCODER, ENCODER_OPTIONS
+    if name == "native":
+        return make_encoder(name, Camera, **options)
+    return make_encoder(name, **options)
+
+encoder = make_output_encoder()
+EXTENSION = encoder.extension
+
+# ライブ映像は撮影ループの間ずっと開始したままにする
+session = CaptureSession(Camera)
+session.metrics = metrics
+# 撮影した画像は保存が終わるまでプールのバッファを使い，保存後に返却して使い回す
+# （保存待ち＋保存中＋表示中＋撮影中の枚数）
+pool = FramePool(SAVE_QUEUE + SAVE_WORKERS + 2)
+session.pool = pool
+# プロファイルは今の設定と違う項目だけを書き込む
+switcher = ProfileSwitcher(session)
+if PROFILE is not None:
+    switcher.apply(profiles[PROFILE])
+session.start()
+
+# 画像保存が完了したらビープ音を鳴らす（鳴り終わるのを待たない．続けて保存されたときは最後の1回だけ鳴らす）
+def on_saved(fileName):
+    with metrics.stage("beep"):
+        beep.beepOn(1500, 500)
+    print(fileName + " was saved", file=sys.stderr)
+
+# 画像保存は別スレッドで行う
+saver = SaveWorker(SAVE_WORKERS, SAVE_QUEUE, on_saved, encoder, metrics)
+# HDR合成も別スレッドで行う（応答曲線はカメラごとに1回だけ推定して保存する）
+hdr = HDRPipeline(DEVICE_NAME, on_saved=on_saved) if HDR else None
+
+def open_archive(number):
+    """フレームを追記するファイルを作る（ファイル名は最初の番号）
+    """
+    shape, dtype = image_format(Camera)
+    return ArchiveWriter(FOLDER_NAME + FILE_NAME + str(number) + ARCHIVE_EXTENSION, shape, dtype,
+                         ARCHIVE_CAPACITY, Camera.GetFormat().value)
+
+archive = open_archive(counter) if ARCHIVE and not HDR else None
+
+def switch_output(number):
+    """プロファイルの切り替えで画素形式か解像度が変わったら，保存形式と追記するファイルを作り直す
+    Params:
+        number: 次に撮影するフレームの番号
+    """
+    global encoder, EXTENSION, saver, archive
+    # 保存待ちのフレームは前の保存形式で書き込んでおく
+    saver.close()
+    encoder = make_output_encoder()
+    EXTENSION = encoder.extension
+    saver = SaveWorker(SAVE_WORKERS, SAVE_QUEUE, on_saved, encoder, metrics)
+    if archive is not None:
+        archive.close()
+        archive = open_archive(number)
+
+def save(fileName, item):
+    """撮影したものを保存キューに入れる
+    """
+    global archive
+    if HDR:
+        img_list, times = item
+        hdr.submit(os.path.splitext(fileName)[0], img_list, times)
+    elif archive is not None:
+        if archive.remaining() == 0:
+            archive.close()
+            archive = open_archive(counter)
+        exposure, gain = session.reference()
+        with metrics.stage("archive"):
+            archive.append(item, exposure=exposure, gain=gain, number=counter)
+        pool.release(item)
+    else:
+        saver.submit(fileName, item, pool.release)
+
+unsaved = None # 撮影済みで保存キューに入っていないフレーム
+
+# 撮影時刻の記録
+timing_path = FOLDER_NAME + TIMING_FILE
+new_timing = not os.path.exists(timing_path)
+timing_log = open(timing_path, "a", encoding="utf-8")
+if new_timing:
+    timing_log.write("file,slot,timestamp,jitter_ms,missed\n")
+
+# 撮影開始時刻からSLEEP_SEC間隔で撮影する
+scheduler = IntervalScheduler(SLEEP_SEC)
 
 # 繰り返し処理
 while cmd == "y":
 
     try:
 
+        # 次の撮影時刻まで待つ
+        with metrics.stage("sleep"):
+            tick = scheduler.wait()
+        if tick.missed > 0:
+            metrics.drop("slot", tick.missed)
+            print(f"{tick.missed} slot(s) missed", file=sys.stderr)
+
         # ファイル名生成
         fileName = FOLDER_NAME + FILE_NAME + str(counter) + EXTENSION
 
         # カメラ画像取得
-        frame = capture(Camera)
+        if HDR:
+            img_list, times = session.bracket(bracket=BRACKET)
+            metrics.frame()
+            frame = img_list[len(img_list)//2]
+            unsaved = (img_list, times)
+        else:
+            frame = session.capture()
+            unsaved = frame
 
-        # 画像保存
-        cv2.imwrite(fileName, frame)
+        # 画像保存（キューが一杯なら空くまで待つ）
+        # 保存キューに入るまではunsavedに残しておく（キューの空きを待っている間のCtrl+Cでも保存する）
+        save(fileName, unsaved)
+        unsaved = None
+        timing_log.write(f"{fileName},{tick.index},{tick.timestamp:.6f},{tick.jitter*1000:.3f},{tick.missed}\n")
 
-        # 表示用に画像サイズを変更
-        edt_h = int(frame.shape[0]*SHOW_WIN_SCALE)
-        edt_w = int(frame.shape[1]*SHOW_WIN_SCALE)
-        cv2.resizeWindow("camera", edt_w, edt_h) 
-
-        # カメラ画像出力
-        cv2.imshow('camera', frame)
-        key = cv2.waitKey(10)
-        
-        # 画像保存が完了したらビープ音を鳴らす
-        beep.beepOn(1500, 500)
-        print(fileName + " was saved", file=sys.stderr)
-        
-        # 一定時間停止
-        time.sleep(SLEEP_SEC)
+        # カメラ画像出力（縮小して表示スレッドに渡す）
+        preview.show(frame)
+        key = preview.get_key()
+        if key >= 0 and chr(key & 0xFF) in PROFILE_KEYS:
+            name = PROFILE_KEYS[chr(key & 0xFF)]
+            output_format = image_format(Camera)
+            print(f"profile: {name} ({switcher.apply(profiles[name])} changes)", file=sys.stderr)
+            if image_format(Camera) != output_format:
+                switch_output(counter + 1)
 
         counter += 1
 
@@ -87,9 +241,34 @@ while cmd == "y":
     except KeyboardInterrupt:
         print("receive control+c\n")
         cmd = "n"
+        # 撮影済みのフレームは取りこぼさずに保存する
+        if unsaved is not None:
+            save(fileName, unsaved)
+            unsaved = None
+
+    # 撮影できなくなったら（フレームが届かない，再生が終わったなど）処理を終了
+    except RuntimeError as ex:
+        print(ex, file=sys.stderr)
+        cmd = "n"
+
+# 保存待ちのフレームを全て書き込む
+saver.close()
+if hdr is not None:
+    hdr.close()
+if archive is not None:
+    archive.close()
+timing_log.close()
+if exporter is not None:
+    exporter.close()
+    print(metrics.summary())
+
+summary = scheduler.summary()
+print(f"shots: {summary['count']}, missed slots: {summary['missed']}, "
+      f"jitter mean/max: {summary['jitter_mean']*1000:.1f}/{summary['jitter_max']*1000:.1f} ms")
 
 # メモリ解放
+session.stop()
 # ic.IC_ReleaseGrabber(hGrabber)
-cv2.destroyAllWindows()
+preview.close()
 
 print("Finish process")
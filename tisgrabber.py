@@ -1,4 +1,5 @@
 import ctypes
+import importlib
 import os
 import sys
 import numpy as np
@@ -194,15 +195,77 @@ def openDevice(ic):
 
 ############################################################################################
 
+def _load_library():
+    '''
+    Loads tisgrabber*.dll and initializes the library.
+    Raises OSError if the DLL is not available (e.g. on Linux).
+    '''
+    if not hasattr(ctypes, "windll"):
+        raise OSError("tisgrabber*.dll can only be loaded on Windows")
+    if sys.maxsize > 2**32 :
+        return ctypes.windll.LoadLibrary("./module/tisgrabber_x64.dll")
+    return ctypes.windll.LoadLibrary("tisgrabber.dll")
+
+
+class _LazyDLL(type):
+    '''
+    Metaclass of TIS_GrabberDLL. The DLL is loaded when the first function is used,
+    and each function is resolved from _functions on first access and cached
+    as a class attribute. Importing this module therefore costs no DLL work.
+    '''
+    def _library(cls):
+        if cls._dll is None:
+            dll = _load_library()
+            cls.InitLibrary = dll.IC_InitLibrary(None)
+            cls._dll = dll
+        return cls._dll
+
+    def __getattr__(cls, name):
+        if name == "InitLibrary":
+            cls._library()
+            return cls.InitLibrary
+        spec = cls.__dict__["_functions"].get(name)
+        if spec is None:
+            raise AttributeError(name)
+        func = getattr(cls._library(), spec["export"])
+        if "restype" in spec:
+            func.restype = spec["restype"]
+        if "argtypes" in spec:
+            func.argtypes = spec["argtypes"]
+        setattr(cls, name, func)
+        return func
+
+
+# Property and element names encoded for the DLL, see TIS_CAM.s().
+_ENCODED_NAMES = {}
+
+
+# Backends of TIS_CAM. "dll" is the camera driven by tisgrabber*.dll,
+# the others are looked up in BACKENDS as (module, class).
+# Select one with TIS_CAM(backend=...) or the environment variable TIS_BACKEND.
+BACKEND_ENV = "TIS_BACKEND"
+BACKENDS = {"sim": ("simCam", "SimCamera"),
+            "replay": ("replayCam", "ReplayCamera")}
+
+
+def load_backend(name):
+    '''
+    Returns the camera class of the backend name.
+    '''
+    if name not in BACKENDS:
+        raise ValueError("unknown backend: %s (dll, %s)" % (name, ", ".join(BACKENDS)))
+    module, cls = BACKENDS[name]
+    return getattr(importlib.import_module(module), cls)
+
+
 class GrabberHandle(ctypes.Structure):
     pass
 GrabberHandle._fields_ = [('unused', ctypes.c_int)]
 
-class TIS_GrabberDLL(object):
-    if sys.maxsize > 2**32 :
-        __tisgrabber = ctypes.windll.LoadLibrary("./module/tisgrabber_x64.dll")
-    else:
-        __tisgrabber = ctypes.windll.LoadLibrary("tisgrabber.dll")
+class TIS_GrabberDLL(object, metaclass=_LazyDLL):
+    _dll = None
+    # name: dict(export=name in the DLL, restype=..., argtypes=...)
+    _functions = {}
     
     def __init__(self, **keyargs):
         """Initialize the Albatross from the keyword arguments."""
@@ -217,7 +280,7 @@ class TIS_GrabberDLL(object):
 #	@retval IC_SUCCESS on success.
 #	@retval IC_ERROR on wrong license key or other errors.
 #	@sa IC_CloseLibrary
-    InitLibrary = __tisgrabber.IC_InitLibrary(None)
+#	InitLibrary is called automatically when the DLL is loaded.
     
 #     Get the number of the currently available devices. This function creates an
 #	internal array of all connected video capture devices. With each call to this 
@@ -230,9 +293,9 @@ class TIS_GrabberDLL(object):
 #
 #	@sa IC_GetDevice
 #	@sa IC_GetUniqueNamefromList
-    get_devicecount =  __tisgrabber.IC_GetDeviceCount
-    get_devicecount.restype = ctypes.c_int
-    get_devicecount.argtypes = None
+    _functions["get_devicecount"] = dict(export="IC_GetDeviceCount",
+                                         restype=ctypes.c_int,
+                                         argtypes=None)
     
 #     Get unique device name of a device specified by iIndex. The unique device name
 #	consist from the device name and its serial number. It allows to differ between 
@@ -248,16 +311,16 @@ class TIS_GrabberDLL(object):
 #	@sa IC_GetUniqueNamefromList
 #	@sa IC_OpenDevByUniqueName
 
-    get_unique_name_from_list = __tisgrabber.IC_GetUniqueNamefromList
-    get_unique_name_from_list.restype = ctypes.c_char_p
-    get_unique_name_from_list.argtypes = (ctypes.c_int,)
+    _functions["get_unique_name_from_list"] = dict(export="IC_GetUniqueNamefromList",
+                                                   restype=ctypes.c_char_p,
+                                                   argtypes=(ctypes.c_int,))
     
 #     Creates a new grabber handle and returns it. A new created grabber should be
 #	release with a call to IC_ReleaseGrabber if it is no longer needed.
 #	@sa IC_ReleaseGrabber
-    create_grabber = __tisgrabber.IC_CreateGrabber
-    create_grabber.restype = GrabberHandlePtr
-    create_grabber.argtypes = None
+    _functions["create_grabber"] = dict(export="IC_CreateGrabber",
+                                        restype=GrabberHandlePtr,
+                                        argtypes=None)
 
 #    Open a video capture by using its UniqueName. Use IC_GetUniqueName() to
 #    retrieve the unique name of a camera.
@@ -267,32 +330,29 @@ class TIS_GrabberDLL(object):
 #
 #	@sa IC_GetUniqueName
 #	@sa IC_ReleaseGrabber
-    open_device_by_unique_name = __tisgrabber.IC_OpenDevByUniqueName
-    open_device_by_unique_name.restype = ctypes.c_int
-    open_device_by_unique_name.argtypes = (GrabberHandlePtr,
-                                           ctypes.c_char_p)   
+    _functions["open_device_by_unique_name"] = dict(export="IC_OpenDevByUniqueName",
+                                                    restype=ctypes.c_int,
+                                                    argtypes=(GrabberHandlePtr, ctypes.c_char_p))
                                            
 
-    set_videoformat = __tisgrabber.IC_SetVideoFormat
-    set_videoformat.restype = ctypes.c_int
-    set_videoformat.argtypes = (GrabberHandlePtr,
-                                           ctypes.c_char_p)   
+    _functions["set_videoformat"] = dict(export="IC_SetVideoFormat",
+                                         restype=ctypes.c_int,
+                                         argtypes=(GrabberHandlePtr, ctypes.c_char_p))
 
-    set_framerate = __tisgrabber.IC_SetFrameRate
-    set_framerate.restype = ctypes.c_int
-    set_framerate.argtypes = (GrabberHandlePtr,
-                                           ctypes.c_float)   
+    _functions["set_framerate"] = dict(export="IC_SetFrameRate",
+                                       restype=ctypes.c_int,
+                                       argtypes=(GrabberHandlePtr, ctypes.c_float))
                                           
                                           
 #    Returns the width of the video format.                                          
-    get_video_format_width = __tisgrabber.IC_GetVideoFormatWidth
-    get_video_format_width.restype = ctypes.c_int
-    get_video_format_width.argtypes = (GrabberHandlePtr,)                                          
+    _functions["get_video_format_width"] = dict(export="IC_GetVideoFormatWidth",
+                                                restype=ctypes.c_int,
+                                                argtypes=(GrabberHandlePtr,))
     
 #    returns the height of the video format.
-    get_video_format_height = __tisgrabber.IC_GetVideoFormatHeight
-    get_video_format_height.restype = ctypes.c_int
-    get_video_format_height.argtypes = (GrabberHandlePtr,)                            
+    _functions["get_video_format_height"] = dict(export="IC_GetVideoFormatHeight",
+                                                 restype=ctypes.c_int,
+                                                 argtypes=(GrabberHandlePtr,))
     
     
 #    Get the number of the available video formats for the current device. 
@@ -305,9 +365,9 @@ class TIS_GrabberDLL(object):
 #	@retval IC_NO_HANDLE No handle to the grabber object.
 #
 #	@sa IC_GetVideoFormat
-    GetVideoFormatCount = __tisgrabber.IC_GetVideoFormatCount
-    GetVideoFormatCount.restype = ctypes.c_int
-    GetVideoFormatCount.argtypes = (GrabberHandlePtr,)
+    _functions["GetVideoFormatCount"] = dict(export="IC_GetVideoFormatCount",
+                                             restype=ctypes.c_int,
+                                             argtypes=(GrabberHandlePtr,))
 
 #     Get a string representation of the video format specified by iIndex. 
 #	iIndex must be between 0 and IC_GetVideoFormatCount().
@@ -320,10 +380,9 @@ class TIS_GrabberDLL(object):
 #	@retval Nonnull The name of the specified video format.
 #	@retval NULL An error occured.
 #	@sa IC_GetVideoFormatCount
-    GetVideoFormat = __tisgrabber.IC_GetVideoFormat
-    GetVideoFormat.restype = ctypes.c_char_p
-    GetVideoFormat.argtypes = (GrabberHandlePtr,
-                               ctypes.c_int,) 
+    _functions["GetVideoFormat"] = dict(export="IC_GetVideoFormat",
+                                        restype=ctypes.c_char_p,
+                                        argtypes=(GrabberHandlePtr, ctypes.c_int,))
 
 #    Get the number of the available input channels for the current device.
 #    A video	capture device must have been opened before this call.
@@ -335,9 +394,9 @@ class TIS_GrabberDLL(object):
 #	@retval IC_NO_HANDLE No handle to the grabber object.
 #
 #	@sa IC_GetInputChannel                               
-    GetInputChannelCount = __tisgrabber.IC_GetInputChannelCount
-    GetInputChannelCount.restype = ctypes.c_int
-    GetInputChannelCount.argtypes = (GrabberHandlePtr,)
+    _functions["GetInputChannelCount"] = dict(export="IC_GetInputChannelCount",
+                                              restype=ctypes.c_int,
+                                              argtypes=(GrabberHandlePtr,))
     
 #     Get a string representation of the input channel specified by iIndex. 
 #	iIndex must be between 0 and IC_GetInputChannelCount().
@@ -349,10 +408,9 @@ class TIS_GrabberDLL(object):
 #	@retval Nonnull The name of the specified input channel
 #	@retval NULL An error occured.
 #	@sa IC_GetInputChannelCount
-    GetInputChannel = __tisgrabber.IC_GetInputChannel
-    GetInputChannel.restype = ctypes.c_char_p
-    GetInputChannel.argtypes = (GrabberHandlePtr,
-                               ctypes.c_int,)     
+    _functions["GetInputChannel"] = dict(export="IC_GetInputChannel",
+                                         restype=ctypes.c_char_p,
+                                         argtypes=(GrabberHandlePtr, ctypes.c_int,))
     
     
 #     Get the number of the available video norms for the current device. 
@@ -365,9 +423,9 @@ class TIS_GrabberDLL(object):
 #	@retval IC_NO_HANDLE No handle to the grabber object.
 #	
 #	@sa IC_GetVideoNorm
-    GetVideoNormCount = __tisgrabber.IC_GetVideoNormCount
-    GetVideoNormCount.restype = ctypes.c_int
-    GetVideoNormCount.argtypes = (GrabberHandlePtr,)
+    _functions["GetVideoNormCount"] = dict(export="IC_GetVideoNormCount",
+                                           restype=ctypes.c_int,
+                                           argtypes=(GrabberHandlePtr,))
     
     
 #     Get a string representation of the video norm specified by iIndex. 
@@ -381,19 +439,17 @@ class TIS_GrabberDLL(object):
 #	@retval Nonnull The name of the specified video norm.
 #	@retval NULL An error occured.
 #	@sa IC_GetVideoNormCount
-    GetVideoNorm = __tisgrabber.IC_GetVideoNorm
-    GetVideoNorm.restype = ctypes.c_char_p
-    GetVideoNorm.argtypes = (GrabberHandlePtr,
-                               ctypes.c_int,)  
+    _functions["GetVideoNorm"] = dict(export="IC_GetVideoNorm",
+                                      restype=ctypes.c_char_p,
+                                      argtypes=(GrabberHandlePtr, ctypes.c_int,))
 
 
-    SetFormat = __tisgrabber.IC_SetFormat
-    SetFormat.restype = ctypes.c_int
-    SetFormat.argtypes = (GrabberHandlePtr,
-                               ctypes.c_int,)  
-    GetFormat = __tisgrabber.IC_GetFormat
-    GetFormat.restype = ctypes.c_int
-    GetFormat.argtypes = (GrabberHandlePtr,)  
+    _functions["SetFormat"] = dict(export="IC_SetFormat",
+                                   restype=ctypes.c_int,
+                                   argtypes=(GrabberHandlePtr, ctypes.c_int,))
+    _functions["GetFormat"] = dict(export="IC_GetFormat",
+                                   restype=ctypes.c_int,
+                                   argtypes=(GrabberHandlePtr,))
 
 
 #    Start the live video. 
@@ -403,20 +459,18 @@ class TIS_GrabberDLL(object):
 #	@retval IC_ERROR if something went wrong.
 #	@sa IC_StopLive
 
-    StartLive = __tisgrabber.IC_StartLive
-    StartLive.restype = ctypes.c_int
-    StartLive.argtypes = (GrabberHandlePtr,
-                               ctypes.c_int,) 
+    _functions["StartLive"] = dict(export="IC_StartLive",
+                                   restype=ctypes.c_int,
+                                   argtypes=(GrabberHandlePtr, ctypes.c_int,))
 
-    StopLive = __tisgrabber.IC_StopLive
-    StopLive.restype = ctypes.c_int
-    StopLive.argtypes = (GrabberHandlePtr,) 
+    _functions["StopLive"] = dict(export="IC_StopLive",
+                                  restype=ctypes.c_int,
+                                  argtypes=(GrabberHandlePtr,))
 
 
-    SetHWND = __tisgrabber.IC_SetHWnd
-    SetHWND.restype = ctypes.c_int
-    SetHWND.argtypes = (GrabberHandlePtr,
-                               ctypes.c_int,) 
+    _functions["SetHWND"] = dict(export="IC_SetHWnd",
+                                 restype=ctypes.c_int,
+                                 argtypes=(GrabberHandlePtr, ctypes.c_int,))
 
 
 #    Snaps an image. The video capture device must be set to live mode and a 
@@ -435,10 +489,9 @@ class TIS_GrabberDLL(object):
 #	@sa IC_StartLive 
 #	@sa IC_SetFormat
     
-    SnapImage=__tisgrabber.IC_SnapImage
-    SnapImage.restype = ctypes.c_int
-    SnapImage.argtypes = (GrabberHandlePtr,
-                               ctypes.c_int,) 
+    _functions["SnapImage"] = dict(export="IC_SnapImage",
+                                   restype=ctypes.c_int,
+                                   argtypes=(GrabberHandlePtr, ctypes.c_int,))
  
  
 #    Retrieve the properties of the current video format and sink type 
@@ -450,159 +503,158 @@ class TIS_GrabberDLL(object):
 #	@retval IC_SUCCESS on success
 #	@retval IC_ERROR if something went wrong.
                            
-    GetImageDescription = __tisgrabber.IC_GetImageDescription
-    GetImageDescription.restype = ctypes.c_int     
-    GetImageDescription.argtypes = (GrabberHandlePtr,
-                                    ctypes.POINTER(ctypes.c_long),
-                                    ctypes.POINTER(ctypes.c_long),
-                                    ctypes.POINTER(ctypes.c_int),
-                                    ctypes.POINTER(ctypes.c_int),)
+    _functions["GetImageDescription"] = dict(export="IC_GetImageDescription",
+                                             restype=ctypes.c_int,
+                                             argtypes=(GrabberHandlePtr, ctypes.POINTER(ctypes.c_long), ctypes.POINTER(ctypes.c_long), ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int),))
                       
      
      
 
-    GetImagePtr = __tisgrabber.IC_GetImagePtr
-    GetImagePtr.restype = ctypes.c_void_p
-    GetImagePtr.argtypes = (GrabberHandlePtr,) 
+    _functions["GetImagePtr"] = dict(export="IC_GetImagePtr",
+                                     restype=ctypes.c_void_p,
+                                     argtypes=(GrabberHandlePtr,))
     
     
 # ############################################################################
-    ShowDeviceSelectionDialog = __tisgrabber.IC_ShowDeviceSelectionDialog
-    ShowDeviceSelectionDialog.restype = GrabberHandlePtr
-    ShowDeviceSelectionDialog.argtypes = (GrabberHandlePtr,)
+    _functions["ShowDeviceSelectionDialog"] = dict(export="IC_ShowDeviceSelectionDialog",
+                                                   restype=GrabberHandlePtr,
+                                                   argtypes=(GrabberHandlePtr,))
 
 # ############################################################################
     
-    ShowPropertyDialog = __tisgrabber.IC_ShowPropertyDialog
-    ShowPropertyDialog.restype = GrabberHandlePtr
-    ShowPropertyDialog.argtypes = (GrabberHandlePtr,)
+    _functions["ShowPropertyDialog"] = dict(export="IC_ShowPropertyDialog",
+                                            restype=GrabberHandlePtr,
+                                            argtypes=(GrabberHandlePtr,))
     
 # ############################################################################
-    IsDevValid = __tisgrabber.IC_IsDevValid
-    IsDevValid.restype = ctypes.c_int     
-    IsDevValid.argtypes = (GrabberHandlePtr,)
+    _functions["IsDevValid"] = dict(export="IC_IsDevValid",
+                                    restype=ctypes.c_int,
+                                    argtypes=(GrabberHandlePtr,))
 
 # ############################################################################
 
-    LoadDeviceStateFromFile = __tisgrabber.IC_LoadDeviceStateFromFile
-    LoadDeviceStateFromFile.restype = GrabberHandlePtr     
-    LoadDeviceStateFromFile.argtypes = (GrabberHandlePtr,ctypes.c_char_p)
+    _functions["LoadDeviceStateFromFile"] = dict(export="IC_LoadDeviceStateFromFile",
+                                                 restype=GrabberHandlePtr,
+                                                 argtypes=(GrabberHandlePtr, ctypes.c_char_p))
     
 # ############################################################################
-    SaveDeviceStateToFile = __tisgrabber.IC_SaveDeviceStateToFile
-    SaveDeviceStateToFile.restype = ctypes.c_int     
-    SaveDeviceStateToFile.argtypes = (GrabberHandlePtr,ctypes.c_char_p)
+    _functions["SaveDeviceStateToFile"] = dict(export="IC_SaveDeviceStateToFile",
+                                               restype=ctypes.c_int,
+                                               argtypes=(GrabberHandlePtr, ctypes.c_char_p))
     
     
-    GetCameraProperty = __tisgrabber.IC_GetCameraProperty
-    GetCameraProperty.restype = ctypes.c_int
-    GetCameraProperty.argtypes = (GrabberHandlePtr,
-                                                 ctypes.c_int,
-                                                 ctypes.POINTER(ctypes.c_long),)
+    _functions["GetCameraProperty"] = dict(export="IC_GetCameraProperty",
+                                           restype=ctypes.c_int,
+                                           argtypes=(GrabberHandlePtr, ctypes.c_int, ctypes.POINTER(ctypes.c_long),))
 
-    SetCameraProperty = __tisgrabber.IC_SetCameraProperty
-    SetCameraProperty.restype = ctypes.c_int
-    SetCameraProperty.argtypes = (GrabberHandlePtr,
-                                                 ctypes.c_int,
-                                                 ctypes.c_long,)
+    _functions["SetCameraProperty"] = dict(export="IC_SetCameraProperty",
+                                           restype=ctypes.c_int,
+                                           argtypes=(GrabberHandlePtr, ctypes.c_int, ctypes.c_long,))
 
 
-    SetPropertyValue = __tisgrabber.IC_SetPropertyValue
-    SetPropertyValue.restype = ctypes.c_int
-    SetPropertyValue.argtypes = (GrabberHandlePtr,
-                            ctypes.c_char_p,
-                            ctypes.c_char_p,
-                            ctypes.c_int, )
+    _functions["SetPropertyValue"] = dict(export="IC_SetPropertyValue",
+                                          restype=ctypes.c_int,
+                                          argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int,))
 
 
-    GetPropertyValue = __tisgrabber.IC_GetPropertyValue
-    GetPropertyValue.restype = ctypes.c_int
-    GetPropertyValue.argtypes = (GrabberHandlePtr,
-                            ctypes.c_char_p,
-                            ctypes.c_char_p,
-                            ctypes.POINTER(ctypes.c_long), )
+    _functions["GetPropertyValue"] = dict(export="IC_GetPropertyValue",
+                                          restype=ctypes.c_int,
+                                          argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_long),))
 
 
 # ############################################################################
-    SetPropertySwitch = __tisgrabber.IC_SetPropertySwitch
-    SetPropertySwitch.restype = ctypes.c_int
-    SetPropertySwitch.argtypes= (GrabberHandlePtr,
-                                 ctypes.c_char_p,
-                                 ctypes.c_char_p,
-                                  ctypes.c_int,)
-
-    GetPropertySwitch = __tisgrabber.IC_GetPropertySwitch
-    GetPropertySwitch.restype = ctypes.c_int
-    GetPropertySwitch.argtypes= (GrabberHandlePtr,
-                                 ctypes.c_char_p,
-                                 ctypes.c_char_p,
-                                 ctypes.POINTER(ctypes.c_long),)
+    _functions["SetPropertySwitch"] = dict(export="IC_SetPropertySwitch",
+                                           restype=ctypes.c_int,
+                                           argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int,))
+
+    _functions["GetPropertySwitch"] = dict(export="IC_GetPropertySwitch",
+                                           restype=ctypes.c_int,
+                                           argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_long),))
 # ############################################################################
 
-    IsPropertyAvailable =  __tisgrabber.IC_IsPropertyAvailable
-    IsPropertyAvailable.restype =  ctypes.c_int
-    IsPropertyAvailable.argtypes=  (GrabberHandlePtr,
-                                 ctypes.c_char_p,
-                                 ctypes.c_char_p,)
-
-    PropertyOnePush = __tisgrabber.IC_PropertyOnePush
-    PropertyOnePush.restype = ctypes.c_int
-    PropertyOnePush.argtypes = (GrabberHandlePtr,
-                            ctypes.c_char_p,
-                            ctypes.c_char_p, )
-
-
-    SetPropertyAbsoluteValue = __tisgrabber.IC_SetPropertyAbsoluteValue
-    SetPropertyAbsoluteValue.restype = ctypes.c_int
-    SetPropertyAbsoluteValue.argtypes = (GrabberHandlePtr,
-                            ctypes.c_char_p,
-                            ctypes.c_char_p,
-                            ctypes.c_float, )
-
-    GetPropertyAbsoluteValue = __tisgrabber.IC_GetPropertyAbsoluteValue
-    GetPropertyAbsoluteValue.restype = ctypes.c_int
-    GetPropertyAbsoluteValue.argtypes = (GrabberHandlePtr,
-                            ctypes.c_char_p,
-                            ctypes.c_char_p,
-                            ctypes.POINTER(ctypes.c_float), )
+    _functions["IsPropertyAvailable"] = dict(export="IC_IsPropertyAvailable",
+                                             restype=ctypes.c_int,
+                                             argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p,))
+
+    _functions["PropertyOnePush"] = dict(export="IC_PropertyOnePush",
+                                         restype=ctypes.c_int,
+                                         argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p,))
+
+
+    _functions["SetPropertyAbsoluteValue"] = dict(export="IC_SetPropertyAbsoluteValue",
+                                                  restype=ctypes.c_int,
+                                                  argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_float,))
+
+    _functions["GetPropertyAbsoluteValue"] = dict(export="IC_GetPropertyAbsoluteValue",
+                                                  restype=ctypes.c_int,
+                                                  argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_float),))
+
+    _functions["GetPropertyValueRange"] = dict(export="IC_GetPropertyValueRange",
+                                               restype=ctypes.c_int,
+                                               argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_long), ctypes.POINTER(ctypes.c_long),))
+
+    _functions["GetPropertyAbsoluteValueRange"] = dict(export="IC_GetPropertyAbsoluteValueRange",
+                                                       restype=ctypes.c_int,
+                                                       argtypes=(GrabberHandlePtr, ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_float), ctypes.POINTER(ctypes.c_float),))
 
     # definition of the frameready callback
     FRAMEREADYCALLBACK = ctypes.CFUNCTYPE(ctypes.c_void_p,ctypes.c_int, ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulong,  ctypes.py_object )
 
     # set callback function
-    SetFrameReadyCallback = __tisgrabber.IC_SetFrameReadyCallback
-    SetFrameReadyCallback.restype = ctypes.c_int
-    SetFrameReadyCallback.argtypes = [GrabberHandlePtr, FRAMEREADYCALLBACK, ctypes.py_object]
+    _functions["SetFrameReadyCallback"] = dict(export="IC_SetFrameReadyCallback",
+                                               restype=ctypes.c_int,
+                                               argtypes=[GrabberHandlePtr, FRAMEREADYCALLBACK, ctypes.py_object])
 
-    SetContinuousMode = __tisgrabber.IC_SetContinuousMode
+    _functions["SetContinuousMode"] = dict(export="IC_SetContinuousMode")
 
-    SaveImage = __tisgrabber.IC_SaveImage
-    SaveImage.restype = ctypes.c_int
-    SaveImage.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_int ]
+    _functions["SaveImage"] = dict(export="IC_SaveImage",
+                                   restype=ctypes.c_int,
+                                   argtypes=[ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_int ])
 
-    OpenVideoCaptureDevice = __tisgrabber.IC_OpenVideoCaptureDevice
-    OpenVideoCaptureDevice.restype = ctypes.c_int
-    OpenVideoCaptureDevice.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    _functions["OpenVideoCaptureDevice"] = dict(export="IC_OpenVideoCaptureDevice",
+                                                restype=ctypes.c_int,
+                                                argtypes=[ctypes.c_void_p, ctypes.c_char_p])
 
 class TIS_CAM(object):
         @property
         def callback_registered(self):
             return self._callback_registered
+
+        def __new__(cls, backend=None, **keyargs):
+            """ Create the camera object.
+            backend : "dll" (default) or a name in BACKENDS, e.g. "sim".
+                      If omitted, the environment variable TIS_BACKEND is used.
+            keyargs : Passed to the backend class, e.g. width=640 for "sim",
+                      source="./image/" for "replay".
+            """
+            backend = backend or os.environ.get(BACKEND_ENV, "dll")
+            if backend == "dll":
+                return object.__new__(cls)
+            return load_backend(backend)(**keyargs)
       
-        def __init__(self):
+        def __init__(self, backend=None, **keyargs):
           
             self._handle = ctypes.POINTER(GrabberHandle)
             self._handle = TIS_GrabberDLL.create_grabber()
             self._callback_registered = False
             self._frame = {'num'    :   -1,
                            'ready'  :   False}    
+            # Cached image description and ctypes buffer type, see GetImageDescription.
+            self._description = None
+            self._buffer_type = None
                                   
         def s(self,strin):
             if sys.version[0] == "2":
                 return strin
-            if type(strin) == "byte":
+            if isinstance(strin, bytes):
                 return strin
-            return strin.encode("utf-8")
+            # Property and element names are passed on every call, so keep them encoded.
+            encoded = _ENCODED_NAMES.get(strin)
+            if encoded is None:
+                encoded = strin.encode("utf-8")
+                if len(_ENCODED_NAMES) < 1024:
+                    _ENCODED_NAMES[strin] = encoded
+            return encoded
 
         def SetFrameReadyCallback(self, CallbackFunction, data):
             """ Set a callback function, which is called, when a new frame arrives. 
@@ -624,12 +676,14 @@ class TIS_CAM(object):
             
             unique_device_name : The name and serial number of the device to be opened. The device name and serial number are separated by a space.
             """
+            self._description = None
             test = TIS_GrabberDLL.open_device_by_unique_name(self._handle,
                                                        self.s(unique_device_name))
 
             return test                                           
 
         def ShowDeviceSelectionDialog(self):
+            self._description = None
             self._handle = TIS_GrabberDLL.ShowDeviceSelectionDialog(self._handle)
             
         def ShowPropertyDialog(self):
@@ -645,10 +699,12 @@ class TIS_CAM(object):
             return TIS_GrabberDLL.SaveDeviceStateToFile(self._handle, self.s(FileName))
             
         def LoadDeviceStateFromFile(self,FileName):
+            self._description = None
             self._handle = TIS_GrabberDLL.LoadDeviceStateFromFile(self._handle,self.s(FileName))
             
 
         def SetVideoFormat(self,Format):
+            self._description = None
             return TIS_GrabberDLL.set_videoformat(self._handle, self.s(Format))
 
         def SetFrameRate(self,FPS):
@@ -696,6 +752,7 @@ class TIS_CAM(object):
             Sets the pixel format in memory
             @param Format Sinkformat enumeration
             '''
+            self._description = None
             TIS_GrabberDLL.SetFormat(self._handle, Format.value)
 
         def GetFormat(self):
@@ -718,6 +775,7 @@ class TIS_CAM(object):
             Start the live video stream.
             showlive: 1 : a live video is shown, 0 : the live video is not shown.
             """
+            self._description = None
             Error = TIS_GrabberDLL.StartLive(self._handle, showlive)
             return Error
 
@@ -725,6 +783,7 @@ class TIS_CAM(object):
             """
             Stop the live video.
             """
+            self._description = None
             Error = TIS_GrabberDLL.StopLive(self._handle)
             return Error
 
@@ -735,6 +794,12 @@ class TIS_CAM(object):
  
  
         def GetImageDescription(self):
+            """ Return (width, height, bits per pixel, color format) of the image buffer.
+            The result is cached until the device, video format, sink format or
+            live state is changed through this object.
+            """
+            if self._description is not None:
+                return self._description
             lWidth=ctypes.c_long()
             lHeight= ctypes.c_long()
             iBitsPerPixel=ctypes.c_int()
@@ -742,7 +807,16 @@ class TIS_CAM(object):
             
             Error = TIS_GrabberDLL.GetImageDescription(self._handle, lWidth,
                                         lHeight,iBitsPerPixel,COLORFORMAT)
-            return (lWidth.value,lHeight.value,iBitsPerPixel.value,COLORFORMAT.value)
+            description = (lWidth.value,lHeight.value,iBitsPerPixel.value,COLORFORMAT.value)
+            if Error == IC_SUCCESS and lWidth.value > 0:
+                self._description = description
+            return description
+
+        def _image_buffer(self, buffer_size):
+            """ Return the image buffer as a ctypes array, reusing the array type. """
+            if self._buffer_type is None or ctypes.sizeof(self._buffer_type) != buffer_size:
+                self._buffer_type = ctypes.c_ubyte * buffer_size
+            return self._buffer_type.from_address(self.GetImagePtr())
         
         def GetImagePtr(self):
             ImagePtr = TIS_GrabberDLL.GetImagePtr(self._handle)
@@ -756,12 +830,9 @@ class TIS_CAM(object):
             iBitsPerPixel=BildDaten[2]//8
 
             buffer_size = lWidth*lHeight*iBitsPerPixel*ctypes.sizeof(ctypes.c_uint8)            
-            img_ptr = self.GetImagePtr()
-            
-            Bild = ctypes.cast(img_ptr, ctypes.POINTER(ctypes.c_ubyte * buffer_size))
-            
+            Bild = self._image_buffer(buffer_size)
             
-            img = np.ndarray(buffer = Bild.contents,
+            img = np.ndarray(buffer = Bild,
                          dtype = np.uint8,
                          shape = (lHeight,
                                   lWidth,
@@ -778,9 +849,7 @@ class TIS_CAM(object):
             iBytesPerPixel=BildDaten[2]//8
 
             buffer_size = lWidth*lHeight*iBytesPerPixel*ctypes.sizeof(ctypes.c_uint8)            
-            img_ptr = self.GetImagePtr()
-            
-            Bild = ctypes.cast(img_ptr, ctypes.POINTER(ctypes.c_ubyte * buffer_size))
+            Bild = self._image_buffer(buffer_size)
             
             pixeltype = np.uint8
 
@@ -788,13 +857,26 @@ class TIS_CAM(object):
                 pixeltype = np.uint16
                 iBytesPerPixel = 1
             
-            img = np.ndarray(buffer = Bild.contents,
+            img = np.ndarray(buffer = Bild,
                          dtype = pixeltype,
                          shape = (lHeight,
                                   lWidth,
                                   iBytesPerPixel))
             return img
 
+        def GetImageInto(self, out):
+            """ Copy the last snapped image into the numpy array out and return it.
+            Unlike GetImage/GetImageEx, the result does not alias the DLL's image buffer,
+            so it stays valid after the next SnapImage.
+            out : array with the shape and dtype of GetImageEx(), e.g. from a buffer pool.
+            """
+            lWidth, lHeight, iBitsPerPixel, COLORFORMAT = self.GetImageDescription()
+            buffer_size = lWidth*lHeight*iBitsPerPixel//8
+            if out.nbytes != buffer_size or not out.flags.c_contiguous:
+                raise ValueError("out must be a contiguous array of %d bytes" % buffer_size)
+            ctypes.memmove(out.ctypes.data, self.GetImagePtr(), buffer_size)
+            return out
+
 
         def GetCameraProperty(self,iProperty):
             lFocusPos = ctypes.c_long()
@@ -853,6 +935,43 @@ class TIS_CAM(object):
                                                     self.s(Element ))
             return error
 
+        def GetPropertyValueRange(self, Property, Element):
+            """ Return (minimum, maximum) of an integer property, or None if it has no range.
+            """
+            lMin = ctypes.c_long()
+            lMax = ctypes.c_long()
+            error = TIS_GrabberDLL.GetPropertyValueRange(self._handle,
+                                                         self.s(Property),
+                                                         self.s(Element),
+                                                         lMin, lMax)
+            if error != IC_SUCCESS:
+                return None
+            return (lMin.value, lMax.value)
+
+        def GetPropertyAbsoluteValueRange(self, Property, Element):
+            """ Return (minimum, maximum) of an absolute value property, or None if it has no range.
+            """
+            fMin = ctypes.c_float()
+            fMax = ctypes.c_float()
+            error = TIS_GrabberDLL.GetPropertyAbsoluteValueRange(self._handle,
+                                                                 self.s(Property),
+                                                                 self.s(Element),
+                                                                 fMin, fMax)
+            if error != IC_SUCCESS:
+                return None
+            return (fMin.value, fMax.value)
+
+        def EnableTrigger(self, Enable):
+            """ Enable (1) or disable (0) the trigger mode.
+            While enabled, frames are only delivered after a software or hardware trigger.
+            """
+            return self.SetPropertySwitch("Trigger", "Enable", int(Enable))
+
+        def SoftwareTrigger(self):
+            """ Fire one software trigger. The camera must be live and in trigger mode.
+            """
+            return self.PropertyOnePush("Trigger", "Software Trigger")
+
         def SetPropertyAbsoluteValue(self, Property, Element, Value ):
             error = TIS_GrabberDLL.SetPropertyAbsoluteValue(self._handle,
                                                     self.s(Property),
@@ -887,11 +1006,12 @@ class TIS_CAM(object):
             :param Quality : If file typ is JPEG, the qualitly can be given from 1 to 100. 
             :return: Error code
             '''
-            return TIS_GrabberDLL.SaveImage(self._handle, self.s(FileName), IC.ImageFileTypes[self.s(FileType)],Quality)
+            return TIS_GrabberDLL.SaveImage(self._handle, self.s(FileName), ImageFileTypes[FileType],Quality)
 
         def openVideoCaptureDevice(self, DeviceName):
             ''' Open the device specified by DeviceName
             :param DeviceName: Name of the device , e.g. "DFK 72AUC02"
             :returns: 1 on success, 0 otherwise.
             '''
+            self._description = None
             return TIS_GrabberDLL.OpenVideoCaptureDevice(self._handle, self.s(DeviceName))
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+    連続したフレームを動画ファイルに分割して記録する
+
+    フレームはsubmit()でバッファプールにコピー（上下反転も同時に行う）してキューに入れ，
+    別スレッドのcv2.VideoWriterでエンコードする．chunk_framesの枚数，
+    またはchunk_secの秒数ごとに次のファイルへ切り替える．
+
+    Y16の画像は上位8bitにして記録する（VideoWriterは8bitのみ）．
+
+    使い方:
+        with VideoRecorder("./video/cam", fps=30, chunk_sec=600) as recorder:
+            for frame in stream:
+                recorder.submit(frame.image)
+"""
+import sys
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from framePool import FramePool
+
+VIDEO_FOURCC = "MJPG"
+VIDEO_EXTENSION = ".avi"
+
+
+class VideoRecorder(object):
+    """動画のエンコードと書き込みを行うスレッド
+    """
+    def __init__(self, base_name, fps, fourcc=VIDEO_FOURCC, extension=VIDEO_EXTENSION,
+                 chunk_frames=None, chunk_sec=None, max_queue=8, bottom_up=True, on_chunk=None):
+        """
+        Params:
+            base_name: ファイル名（"_0000"のような通し番号と拡張子を付け足す）
+            fps: 動画のフレームレート
+            fourcc: コーデック（"MJPG", "XVID", "mp4v"など）
+            extension: 拡張子
+            chunk_frames: 1ファイルの最大枚数（Noneなら制限しない）
+            chunk_sec: 1ファイルの最大秒数（Noneなら制限しない）
+            max_queue: エンコード待ちフレームの最大数
+            bottom_up: Trueなら渡されたフレームをDLLのバッファと同じ上下反転した向きとして扱う
+            on_chunk: 1ファイル書き終えたときにエンコードスレッドから呼ばれる関数 on_chunk(fileName, frames)
+        """
+        self.base_name = base_name
+        self.fps = fps
+        self.fourcc = fourcc
+        self.extension = extension
+        self.chunk_frames = chunk_frames
+        self.chunk_sec = chunk_sec
+        self.bottom_up = bottom_up
+        self.on_chunk = on_chunk
+        self.frames = 0
+        self.dropped = 0
+        self.failed = 0
+        self.chunks = 0
+        self._writer = None
+        self._fileName = None
+        self._chunk_count = 0
+        self._chunk_start = 0.0
+        self._pool = FramePool(max_queue + 1)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="VideoRecorder", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def submit(self, image, block=True):
+        """フレームをコピーしてエンコード待ちに入れる（imageはすぐ書き換えてよい）
+        Params:
+            block: Falseならエンコードが追いつかないときにフレームを捨ててFalseを返す
+        """
+        try:
+            buf = self._pool.acquire(image.shape, np.uint8, None if block else 0)
+        except TimeoutError:
+            self.dropped += 1
+            return False
+        if image.dtype != np.uint8:
+            image = (image >> 8).astype(np.uint8)
+        if self.bottom_up:
+            cv2.flip(image, 0, dst=buf)
+        else:
+            buf[...] = image
+        self._queue.put(buf)
+        return True
+
+    def _open(self, frame):
+        """次のファイルを開く
+        """
+        height, width = frame.shape[:2]
+        self._fileName = "%s_%04d%s" % (self.base_name, self.chunks, self.extension)
+        self._writer = cv2.VideoWriter(self._fileName, cv2.VideoWriter_fourcc(*self.fourcc), self.fps,
+                                       (width, height), frame.ndim == 3 and frame.shape[2] == 3)
+        if not self._writer.isOpened():
+            self._writer = None
+            raise OSError(self._fileName + " could not be opened")
+        self._chunk_count = 0
+        self._chunk_start = time.monotonic()
+
+    def _close_chunk(self):
+        """今のファイルを閉じる
+        """
+        if self._writer is None:
+            return
+        self._writer.release()
+        self._writer = None
+        self.chunks += 1
+        if self.on_chunk is not None:
+            try:
+                self.on_chunk(self._fileName, self._chunk_count)
+            except Exception as ex:
+                print("on_chunk failed: %s: %s" % (type(ex).__name__, ex), file=sys.stderr)
+
+    def _rotate(self):
+        """1ファイルの枚数または秒数を超えたらTrue
+        """
+        if self.chunk_frames is not None and self._chunk_count >= self.chunk_frames:
+            return True
+        return self.chunk_sec is not None and time.monotonic() - self._chunk_start >= self.chunk_sec
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            try:
+                if self._writer is not None and self._rotate():
+                    self._close_chunk()
+                if self._writer is None:
+                    self._open(frame)
+                self._writer.write(frame)
+                self._chunk_count += 1
+                self.frames += 1
+            except Exception as ex:
+                # エンコードスレッドが止まるとバッファが返却されずsubmit()が待ち続けるので，どの例外でも続ける
+                print("%s: %s" % (type(ex).__name__, ex), file=sys.stderr)
+                self.failed += 1
+            finally:
+                self._pool.release(frame)
+        self._close_chunk()
+
+    def close(self):
+        """エンコード待ちのフレームを全て書き込んでからファイルを閉じる
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None